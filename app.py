@@ -1,18 +1,47 @@
 import dearpygui.dearpygui as dpg
+import concurrent.futures
 import os
 import threading
-import time
-from typing import Dict, Optional
-from register_device import register_model_and_device
-from generate_protos import generate_protos
-from assistant_client import GoogleAssistantClient
+from typing import TYPE_CHECKING, Dict, Optional
+from log_buffer import LogBuffer
+from ui_updates import UIUpdateQueue
+
+# assistant_client, register_device and generate_protos pull in grpc, google-auth,
+# oauthlib and protobuf; they are imported on first use so the window opens first.
+# Check with: python benchmarks/bench_startup.py
+if TYPE_CHECKING:
+    from assistant_client import CallControl, GoogleAssistantClient
 
 class AssistantGUI:
-    def __init__(self):
-        self.assistant: Optional[GoogleAssistantClient] = None
+    def __init__(self, log_capacity: int = 500, log_file: Optional[str] = None,
+                 command_timeout: float = 185.0, max_pending_commands: int = 2,
+                 prewarm: bool = True):
+        self.assistant: Optional["GoogleAssistantClient"] = None
         self.setup_complete = False
         self.setup_status: Dict[str, bool] = {}
         self.command_input = ""
+        # Last log_capacity lines are shown; log_file keeps the full history
+        self.log = LogBuffer(capacity=log_capacity, path=log_file)
+        # Widget updates from any thread; applied by run() once per frame
+        self.ui = UIUpdateQueue()
+        
+        # Commands run on a small pool; at most max_pending_commands are running
+        # or queued, each with its own CallControl and an RPC deadline that covers
+        # the whole streamed answer (retry_policy.STREAM_TIMEOUT; not imported
+        # here because it pulls in grpc)
+        self.command_timeout = command_timeout
+        self.interrupt_previous = True
+        self.command_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_pending_commands,
+            thread_name_prefix="assistant-command"
+        )
+        self.command_slots = threading.BoundedSemaphore(max_pending_commands)
+        self.current_command: Optional["CallControl"] = None
+        # Load credentials, connect and open the audio device as soon as setup is complete
+        self.prewarm = prewarm
+        # The client is built on a background thread (see start_assistant)
+        self.assistant_lock = threading.Lock()
+        self.assistant_starting = False
         
         # Initialize DearPyGui
         dpg.create_context()
@@ -49,17 +78,14 @@ class AssistantGUI:
         return required_files
     
     def add_to_log(self, message: str):
-        """Add message to log with timestamp"""
-        timestamp = time.strftime("%H:%M:%S")
-        current_log = dpg.get_value("setup_log")
-        new_log = f"[{timestamp}] {message}\n{current_log}"
-        dpg.set_value("setup_log", new_log)
+        """Add message to log with timestamp (shown on the next frame)"""
+        self.log.append(message)
     
     def update_progress(self, progress: float, message: str = ""):
         """Update progress bar and status message"""
-        dpg.set_value("setup_progress", progress)
+        self.ui.set_value("setup_progress", progress)
         if message:
-            dpg.set_value("status_text", message)
+            self.ui.set_value("status_text", message)
             self.add_to_log(message)
     
     def run_setup_step(self, step_type: str) -> bool:
@@ -68,6 +94,7 @@ class AssistantGUI:
             self.add_to_log(f"Starting {step_type} step...")
             if step_type == "register":
                 self.update_progress(0.5, "Registering device...")
+                from register_device import register_model_and_device
                 result = register_model_and_device()
                 if result:
                     self.update_progress(1.0, "Device registration complete")
@@ -77,6 +104,7 @@ class AssistantGUI:
                 
             elif step_type == "protos":
                 self.update_progress(0.5, "Generating protocol buffers...")
+                from generate_protos import generate_protos
                 result = generate_protos()
                 if result:
                     self.update_progress(1.0, "Protocol buffers generated")
@@ -137,6 +165,16 @@ class AssistantGUI:
                         tag="send_button",
                         width=120
                     )
+                    dpg.add_button(
+                        label="Cancel",
+                        callback=self.cancel_command,
+                        width=120
+                    )
+                    dpg.add_checkbox(
+                        label="New command interrupts the current one",
+                        default_value=self.interrupt_previous,
+                        callback=lambda s, a: setattr(self, "interrupt_previous", a)
+                    )
                 dpg.add_text("", tag="response_text", wrap=400)
             
             # Example Commands Section
@@ -183,12 +221,54 @@ class AssistantGUI:
         # Enable/disable interface based on setup status
         self.setup_complete = all_ready
         if self.setup_complete and not self.assistant:
+            self.start_assistant()
+    
+    def start_assistant(self):
+        """Import and build the client, then prewarm it, off the render thread
+
+        Importing assistant_client pulls in grpc, protobuf and google-auth;
+        doing that here would hold back the first frame on every normal launch.
+        """
+        with self.assistant_lock:
+            if self.assistant_starting:
+                return
+            self.assistant_starting = True
+        
+        def init_thread():
             try:
-                self.assistant = GoogleAssistantClient()
-                dpg.configure_item("send_button", enabled=True)
-                self.add_to_log("Assistant initialized successfully")
+                from assistant_client import GoogleAssistantClient
+                assistant = GoogleAssistantClient()
             except Exception as e:
                 self.add_to_log(f"Failed to initialize assistant: {str(e)}")
+                self.ui.set_value("response_text", "Assistant failed to start, see log")
+                return
+            finally:
+                with self.assistant_lock:
+                    self.assistant_starting = False
+            if not self.setup_complete:
+                # Registration was reset while the client was being built
+                assistant.cleanup()
+                return
+            self.assistant = assistant
+            self.ui.configure_item("send_button", enabled=True)
+            self.add_to_log("Assistant initialized successfully")
+            if self.prewarm:
+                self.ui.set_value("response_text", "Warming up...")
+                self.on_prewarm_ready(assistant.prewarm())
+            else:
+                self.ui.set_value("response_text", "Ready")
+        
+        self.ui.set_value("response_text", "Loading assistant...")
+        threading.Thread(target=init_thread, daemon=True).start()
+    
+    def on_prewarm_ready(self, steps):
+        """Report the background prewarm (runs on the init thread)"""
+        from assistant_client import prewarm_summary
+        failed = [step for step in steps if step.error is not None]
+        self.add_to_log(f"Prewarm {'incomplete' if failed else 'done'}: {prewarm_summary(steps)}")
+        if self.current_command is None:
+            self.ui.set_value("response_text", "Ready" if not failed else
+                              "Ready (first command may be slower, see log)")
         
     def run_setup_wizard(self):
         """Run the setup wizard"""
@@ -224,33 +304,64 @@ class AssistantGUI:
     
     def set_command(self, command: str):
         """Set command from example buttons"""
-        dpg.set_value("command_input", command)
+        self.ui.set_value("command_input", command)
         self.command_input = command
     
     def send_command(self):
         """Send command to Assistant"""
         if not self.command_input:
-            dpg.set_value("response_text", "Please enter a command")
+            self.ui.set_value("response_text", "Please enter a command")
             return
         
         if not self.assistant:
-            dpg.set_value("response_text", "Assistant not initialized. Please complete setup first.")
+            self.ui.set_value("response_text", "Assistant not initialized. Please complete setup first.")
             return
         
-        def send_thread():
-            try:
-                dpg.set_value("response_text", "Processing command...")
-                result = self.assistant.send_command(self.command_input)
-                dpg.set_value("response_text", "Command processed successfully" if result else "Command failed")
-            except Exception as e:
-                dpg.set_value("response_text", f"Error: {str(e)}")
+        if self.interrupt_previous:
+            self.cancel_command()
+        
+        # Bounded: rapid clicks are refused instead of piling up RPCs and audio streams
+        if not self.command_slots.acquire(blocking=False):
+            self.ui.set_value("response_text", "Busy: wait for the current command or cancel it")
+            return
         
-        # Run command in separate thread to avoid blocking GUI
-        threading.Thread(target=send_thread, daemon=True).start()
+        # The command text is captured now, not when a worker picks it up
+        from assistant_client import CallControl
+        control = CallControl()
+        self.current_command = control
+        future = self.command_executor.submit(self.run_command, self.assistant, self.command_input, control)
+        future.add_done_callback(lambda f: self.command_slots.release())
+    
+    def run_command(self, assistant: "GoogleAssistantClient", command: str, control: "CallControl"):
+        """Run one command on a worker thread"""
+        if control.cancelled:
+            return
+        try:
+            self.ui.set_value("response_text", "Processing command...")
+            result = assistant.send_command(command, timeout=self.command_timeout, control=control)
+            if control.cancelled:
+                self.add_to_log(f"Cancelled: {command}")
+                if control is self.current_command:
+                    self.ui.set_value("response_text", "Command cancelled")
+            else:
+                self.ui.set_value("response_text", "Command processed successfully" if result else "Command failed")
+        except Exception as e:
+            self.ui.set_value("response_text", f"Error: {str(e)}")
+    
+    def cancel_command(self):
+        """Cancel the latest command's RPC and playback, if it is still running"""
+        control = self.current_command
+        if control is not None:
+            control.cancel()
     
     def reset_registration(self):
         """Reset device registration"""
         try:
+            # Stop the old client's token refresher first, or it writes token.json back
+            self.cancel_command()
+            if self.assistant:
+                self.assistant.cleanup()
+                self.assistant = None
             files_to_remove = ['token.json', 'device_config.json']
             for file in files_to_remove:
                 if os.path.exists(file):
@@ -259,8 +370,7 @@ class AssistantGUI:
             status_msg = "Device registration reset! Please run setup again."
             self.update_progress(0.0, status_msg)
             self.setup_complete = False
-            self.assistant = None
-            dpg.configure_item("send_button", enabled=False)
+            self.ui.configure_item("send_button", enabled=False)
             self.update_setup_status()
             
         except Exception as e:
@@ -273,10 +383,16 @@ class AssistantGUI:
         self.update_setup_status()
         
         while dpg.is_dearpygui_running():
+            if self.log.dirty:
+                dpg.set_value("setup_log", self.log.render())
+            self.ui.drain(dpg.set_value, dpg.configure_item)
             dpg.render_dearpygui_frame()
         
+        self.cancel_command()
+        self.command_executor.shutdown(wait=False, cancel_futures=True)
+        self.log.close()
         dpg.destroy_context()
 
 if __name__ == "__main__":
-    app = AssistantGUI()
+    app = AssistantGUI(log_file=os.environ.get("ASSISTANT_GUI_LOG"))
     app.run()
\ No newline at end of file
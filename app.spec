@@ -14,7 +14,13 @@ a = Analysis(
         'embedded_assistant_pb2',
         'embedded_assistant_pb2_grpc',
         'grpc',
-        'pkg_resources.py2_warn'
+        'pkg_resources.py2_warn',
+        # Imported lazily by app.py / assistant_client.py so the window opens
+        # before grpc and google-auth load; listed so the bundle always has them
+        'assistant_client',
+        'register_device',
+        'generate_protos',
+        'audio_processing'
     ],
     hookspath=[],
     hooksconfig={},
@@ -1,49 +1,506 @@
 # assistant_client.py
 import os
-os.environ['PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION'] = 'python'
-
+import argparse
+import collections
+import concurrent.futures
+import datetime
 import json
-import wave
-import pyaudio
+import sys
+import threading
+import time
+import google.auth.exceptions
 import google.auth.transport.requests
 import google.oauth2.credentials
 import grpc
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.assistant.embedded.v1alpha2 import (
+from assistant_protos import (
+    describe_backend,
     embedded_assistant_pb2,
     embedded_assistant_pb2_grpc
 )
+from audio_input import EnergyVAD, MicrophoneSource, WavFileSource
+from audio_decoder import ENCODINGS, StreamingDecoder, encoding_value, file_extension, find_ffmpeg
+from audio_output import NullSink, StreamingPlayer, WavFileSink
+from metrics import Metrics, Timer
+from rate_limiter import RateLimited, RateLimiter
+from response_cache import ResponseCache
+from retry_policy import STREAM_TIMEOUT, RetryPolicy
+
+API_ENDPOINT = 'embeddedassistant.googleapis.com'
+LINEAR16 = ENCODINGS['linear16']
+
+# Keep channels warm between commands. Google front ends tolerate one ping a
+# minute on idle connections; gRPC backs off on its own if told to calm down.
+CHANNEL_OPTIONS = [
+    ('grpc.keepalive_time_ms', 60000),
+    ('grpc.keepalive_timeout_ms', 20000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    # Give every pooled channel its own connection instead of sharing one
+    ('grpc.use_local_subchannel_pool', 1),
+]
+
+# Outcome of one prewarm step; error is None when it succeeded
+PrewarmStep = collections.namedtuple('PrewarmStep', ['name', 'seconds', 'error'])
+
+def prewarm_summary(steps):
+    """One line describing a list of PrewarmStep"""
+    parts = []
+    for step in steps:
+        if step.error is None:
+            parts.append(f"{step.name} {step.seconds * 1000:.0f} ms")
+        else:
+            parts.append(f"{step.name} failed ({str(step.error) or type(step.error).__name__})")
+    return ', '.join(parts)
+
+def channel_credentials(insecure=False, root_certificates=None):
+    """Transport credentials for the Assistant channel
+
+    insecure=True talks plaintext to a server on this machine (call credentials
+    are still attached); root_certificates (PEM bytes) trusts a local TLS server.
+    """
+    if insecure:
+        return grpc.local_channel_credentials(grpc.LocalConnectionType.LOCAL_TCP)
+    return grpc.ssl_channel_credentials(root_certificates=root_certificates)
+
+class ChannelPool:
+    """Small round-robin pool of long-lived gRPC channels and Assistant stubs"""
+
+    def __init__(self, target, channel_credentials, size=2, options=None, metrics=None):
+        self.target = target
+        self.channel_credentials = channel_credentials
+        self.size = max(1, size)
+        self.metrics = metrics
+        self.options = list(CHANNEL_OPTIONS if options is None else options)
+        self._lock = threading.Lock()
+        self._channels = []
+        self._stubs = []
+        self._next = 0
+
+    def get_stub(self):
+        """Return the next stub, opening its channel on first use"""
+        with self._lock:
+            index = self._next % self.size
+            self._next += 1
+            if index == len(self._stubs):
+                self._open_channel()
+            return self._stubs[index]
+
+    def warm(self, timeout=10.0):
+        """Open every channel now and wait until each one is connected"""
+        with self._lock:
+            while len(self._stubs) < self.size:
+                self._open_channel()
+            channels = list(self._channels)
+        for channel in channels:
+            grpc.channel_ready_future(channel).result(timeout=timeout)
+
+    def _open_channel(self):
+        # Called with self._lock held
+        channel = grpc.secure_channel(
+            self.target,
+            self.channel_credentials,
+            options=self.options
+        )
+        self._channels.append(channel)
+        self._stubs.append(embedded_assistant_pb2_grpc.EmbeddedAssistantStub(channel))
+        if self.metrics is not None:
+            self._watch_connect(channel)
+
+    def _watch_connect(self, channel):
+        """Record how long a new channel takes to become READY"""
+        opened_at = time.perf_counter()
+
+        def on_state(state):
+            if state == grpc.ChannelConnectivity.READY:
+                self.metrics.observe('channel_connect', time.perf_counter() - opened_at)
+                channel.unsubscribe(on_state)
+
+        channel.subscribe(on_state)
+
+    def close(self):
+        """Close all open channels"""
+        with self._lock:
+            for channel in self._channels:
+                channel.close()
+            self._channels = []
+            self._stubs = []
+            self._next = 0
+
+def load_device_config(path):
+    """Read device_config.json written by register_device.py"""
+    if not os.path.exists(path):
+        raise Exception("Device configuration not found. Please run register_device.py first")
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def build_assist_request(command, device_id, device_model_id, language_code,
+                         encoding=1, sample_rate_hertz=16000, volume_percentage=100,
+                         audio_in_config=None):
+    """Build the config AssistRequest: a text query, or audio_in_config for voice"""
+    query = {'text_query': command} if audio_in_config is None else {'audio_in_config': audio_in_config}
+    config = embedded_assistant_pb2.AssistConfig(
+        **query,
+        audio_out_config=embedded_assistant_pb2.AudioOutConfig(
+            encoding=encoding,  # 1 = LINEAR16
+            sample_rate_hertz=sample_rate_hertz,
+            volume_percentage=volume_percentage,
+        ),
+        dialog_state_in=embedded_assistant_pb2.DialogStateIn(
+            language_code=language_code,
+            conversation_state=b'',
+            is_new_conversation=True
+        ),
+        device_config=embedded_assistant_pb2.DeviceConfig(
+            device_id=device_id,
+            device_model_id=device_model_id
+        )
+    )
+    return embedded_assistant_pb2.AssistRequest(config=config)
+
+def _utcnow():
+    """Naive UTC timestamp, matching google-auth's credential expiry"""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+class StaticCredentialManager:
+    """Fixed access token with no OAuth, for local stand-in servers"""
+
+    def __init__(self, token='local-token'):
+        self.token = token
+
+    def load(self):
+        return self
+
+    def close(self):
+        pass
+
+class CredentialManager:
+    """Holds OAuth credentials in memory and refreshes them before they expire
+
+    token.json is read once. After that the access token is refreshed with the
+    refresh token on a background thread, `refresh_margin` seconds ahead of
+    expiry, so the command path never touches disk or waits on a refresh.
+    """
+
+    def __init__(self, credentials_path, token_path, scopes, refresh_margin=300, retry_delay=30):
+        self.credentials_path = credentials_path
+        self.token_path = token_path
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.retry_delay = retry_delay
+        # Optional metrics.Metrics for background refresh timings
+        self.metrics = None
+        # Current access token; read lock-free by the gRPC metadata plugin
+        self.token = None
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresh_thread = None
+
+    def load(self):
+        """Return the cached credentials, loading them on the first call"""
+        if self._credentials is not None:
+            return self._credentials
+
+        with self._lock:
+            if self._credentials is None:
+                credentials = self._load_from_disk()
+                if credentials is None or not credentials.refresh_token:
+                    credentials = self._run_flow()
+                elif not credentials.valid or credentials.expiry is None:
+                    # Tokens saved without an expiry can't be trusted; refresh once to learn it
+                    try:
+                        self._refresh(credentials)
+                    except google.auth.exceptions.RefreshError as e:
+                        print(f"Error refreshing credentials: {e}")
+                        credentials = self._run_flow()
+
+                self.token = credentials.token
+                self._credentials = credentials
+                self._start_refresher()
+
+        return self._credentials
+
+    def _load_from_disk(self):
+        if not os.path.exists(self.token_path):
+            return None
+
+        try:
+            with open(self.token_path, 'r') as f:
+                token_data = json.load(f)
+
+            with open(self.credentials_path, 'r') as f:
+                cred_data = json.load(f)
+
+            credentials = google.oauth2.credentials.Credentials(
+                token=token_data.get('token'),
+                refresh_token=token_data.get('refresh_token'),
+                token_uri=cred_data['installed']['token_uri'],
+                client_id=cred_data['installed']['client_id'],
+                client_secret=cred_data['installed']['client_secret'],
+                scopes=self.scopes
+            )
+            if token_data.get('expiry'):
+                credentials.expiry = datetime.datetime.fromisoformat(token_data['expiry'])
+            return credentials
+        except Exception as e:
+            print(f"Error loading credentials: {e}")
+            return None
+
+    def _run_flow(self):
+        try:
+            # oauthlib is only needed for the interactive flow, which is rare
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            flow = InstalledAppFlow.from_client_secrets_file(
+                self.credentials_path,
+                scopes=self.scopes
+            )
+            credentials = flow.run_local_server(port=0)
+            self._save(credentials)
+            return credentials
+        except Exception as e:
+            print(f"Error during authentication: {e}")
+            raise
+
+    def _refresh(self, credentials):
+        with Timer(self.metrics, 'credential_refresh'):
+            credentials.refresh(google.auth.transport.requests.Request())
+        self.token = credentials.token
+        # Closed while refreshing (e.g. the token file was just reset): don't write it back
+        if not self._stop.is_set():
+            self._save(credentials)
+
+    def _save(self, credentials):
+        token_data = {
+            'token': credentials.token,
+            'refresh_token': credentials.refresh_token
+        }
+        if credentials.expiry:
+            token_data['expiry'] = credentials.expiry.isoformat()
+
+        tmp_path = f"{self.token_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(token_data, f)
+        os.replace(tmp_path, self.token_path)
+
+    def _seconds_until_refresh(self):
+        expiry = self._credentials.expiry
+        if expiry is None:
+            return self.retry_delay
+        return max((expiry - _utcnow()).total_seconds() - self.refresh_margin, 0)
+
+    def _start_refresher(self):
+        if self._refresh_thread is None and self._credentials.refresh_token:
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self._seconds_until_refresh()):
+            try:
+                self._refresh(self._credentials)
+            except Exception as e:
+                print(f"Error refreshing credentials in background: {e}")
+                if self._stop.wait(self.retry_delay):
+                    break
+
+    def close(self):
+        """Stop the background refresher"""
+        self._stop.set()
+
+class CallControl:
+    """Lets another thread cancel one command: its Assist RPC, decoding and playback"""
 
-class GoogleAssistantClient:
     def __init__(self):
+        self.cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def on_cancel(self, callback):
+        """Run callback on cancel(), or right away if already cancelled"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error cancelling command: {e}")
+
+class AssistResult:
+    """What came back for one command, with timings and byte counts"""
+
+    def __init__(self, command):
+        self.command = command
+        self.started_at = time.perf_counter()
+        self.authenticated_at = None
+        self.stub_ready_at = None
+        self.request_sent_at = None
+        self.first_chunk_at = None
+        self.finished_at = None
+        self.cached = False
+        self.chunks = []
+        self.chunk_count = 0
+        self.audio_bytes = 0
+        self.text = []
+        # Voice commands: what the Assistant heard, and when it stopped listening
+        self.transcript = ''
+        self.end_of_utterance_at = None
+
+    def add_response(self, response, keep_audio=True):
+        if response.speech_results:
+            self.transcript = ''.join(result.transcript for result in response.speech_results)
+        if response.event_type == embedded_assistant_pb2.AssistResponse.END_OF_UTTERANCE:
+            self.end_of_utterance_at = time.perf_counter()
+        if not response.audio_out.audio_data and not response.dialog_state_out.supplemental_display_text:
+            return
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        chunk = response.audio_out.audio_data
+        if chunk:
+            self.chunk_count += 1
+            self.audio_bytes += len(chunk)
+            if keep_audio:
+                self.chunks.append(chunk)
+        if response.dialog_state_out.supplemental_display_text:
+            self.text.append(response.dialog_state_out.supplemental_display_text)
+
+    @classmethod
+    def from_cache(cls, command, entry):
+        """Result served from a ResponseCache entry"""
+        result = cls(command)
+        result.cached = True
+        result.first_chunk_at = result.finished_at = time.perf_counter()
+        result.authenticated_at = result.stub_ready_at = result.request_sent_at = result.started_at
+        result.chunks = [entry.audio]
+        result.chunk_count = 1
+        result.audio_bytes = len(entry.audio)
+        if entry.text:
+            result.text.append(entry.text)
+        return result
+
+    @property
+    def audio(self):
+        """All kept audio as one buffer (a single join, no further copies)"""
+        return memoryview(b''.join(self.chunks))
+
+    def to_record(self):
+        """JSON-friendly summary used by batch mode"""
+        def ms(end):
+            return None if end is None else round((end - self.started_at) * 1000, 1)
+
+        return {
+            'time_to_first_chunk_ms': ms(self.first_chunk_at),
+            'total_ms': ms(self.finished_at),
+            'chunks': self.chunk_count,
+            'audio_bytes': self.audio_bytes,
+            'text': ' '.join(self.text),
+            'transcript': self.transcript,
+            'cached': self.cached,
+        }
+
+class GoogleAssistantClient:
+    def __init__(self, channel_pool_size=2, stream_audio=True, jitter_buffer_ms=120, cache=None,
+                 api_endpoint=None, insecure=False, root_certificates=None,
+                 credential_manager=None, device_config=None, metrics=None,
+                 audio_encoding='linear16', post_process=False, output='speaker',
+                 retry_policy=None, rate_limiter=None):
         self.credentials_path = 'credentials.json'
         self.token_path = 'token.json'
         self.device_config_path = 'device_config.json'
-        self.api_endpoint = 'embeddedassistant.googleapis.com'
+        self.api_endpoint = api_endpoint or API_ENDPOINT
+        # Plaintext or custom-CA TLS, for local stand-in servers
+        self.insecure = insecure
+        self.root_certificates = root_certificates
         self.language_code = 'en-US'
         self.SCOPES = ['https://www.googleapis.com/auth/assistant-sdk-prototype']
         
-        # Audio settings
-        self.audio = pyaudio.PyAudio()
+        # Audio output requested from the Assistant; MP3/Opus are decoded locally
+        self.audio_encoding = encoding_value(audio_encoding)
+        if self.audio_encoding != LINEAR16 and not find_ffmpeg():
+            raise Exception(f"Audio encoding {audio_encoding!r} needs ffmpeg; install it or set FFMPEG_BINARY")
+        self.sample_rate = 16000
+        self.volume_percentage = 100
+        
+        # Optional ResponseCache for repeated text queries
+        self.cache = cache
+        
+        # Optional metrics.Metrics: per-phase histograms and byte/chunk counters
+        self.metrics = metrics
+        
+        # Retries, per-attempt deadlines and hedging for text queries
+        self.retry_policy = retry_policy or RetryPolicy()
+        
+        # Optional RateLimiter: commands wait for (or are refused) a slot before
+        # any network work, and RESOURCE_EXHAUSTED slows it down
+        self.rate_limiter = rate_limiter
+        if rate_limiter is not None and rate_limiter.metrics is None:
+            rate_limiter.metrics = metrics
+        
+        # Credentials are read once and refreshed in the background
+        self.credential_manager = credential_manager or CredentialManager(
+            self.credentials_path,
+            self.token_path,
+            self.SCOPES
+        )
+        if metrics is not None and hasattr(self.credential_manager, 'metrics'):
+            self.credential_manager.metrics = metrics
+        
+        # Connection settings: channels are opened once and reused by every command
+        self.channel_pool_size = channel_pool_size
+        self._channel_pool = None
+        self._lock = threading.Lock()
+        self._thread_state = threading.local()
+        
+        # Audio settings. PyAudio is only opened once something needs a device,
+        # so headless clients with output='null' or a WAV sink never touch it.
+        self._audio = None
+        # Where answers go unless a call says otherwise: 'speaker', 'null', or a
+        # callable taking the sample rate and returning an unstarted sink
+        self.output = output
+        # Play chunks as they arrive instead of after the whole response
+        self.stream_audio = stream_audio
+        self.jitter_buffer_ms = jitter_buffer_ms
+        self.last_playback_stats = None
+        # Trim silence, normalize loudness and resample to the device rate before
+        # playback: True, or a dict of AudioPostProcessor options
+        self.post_process = post_process
+        self._output_rate = None
+        if post_process:
+            self._post_processor(self.sample_rate)
         
         # Load device config
-        if not os.path.exists(self.device_config_path):
-            raise Exception("Device configuration not found. Please run register_device.py first")
-            
-        with open(self.device_config_path, 'r') as f:
-            config = json.load(f)
-            self.device_model_id = config['device_model_id']
-            self.device_id = config['device_id']
-            #print(f"Loaded device config: model_id={self.device_model_id}, device_id={self.device_id}")
-
-    def play_audio(self, audio_data):
-        """Play audio response"""
+        config = device_config or load_device_config(self.device_config_path)
+        self.device_model_id = config['device_model_id']
+        self.device_id = config['device_id']
+        #print(f"Loaded device config: model_id={self.device_model_id}, device_id={self.device_id}")
+
+    @property
+    def audio(self):
+        """Shared PyAudio instance, created on first use"""
+        if self._audio is None:
+            with self._lock:
+                if self._audio is None:
+                    import pyaudio
+                    self._audio = pyaudio.PyAudio()
+        return self._audio
+
+    def play_audio(self, audio_data, rate=None):
+        """Play audio response (bytes or a memoryview over them)"""
         try:
             # Configure audio stream
             stream = self.audio.open(
-                format=pyaudio.paInt16,
+                format=self.audio.get_format_from_width(2),
                 channels=1,
-                rate=16000,
+                rate=rate or self.sample_rate,
                 output=True
             )
             
@@ -57,120 +514,753 @@ class GoogleAssistantClient:
         except Exception as e:
             print(f"Error playing audio: {e}")
 
-    def authenticate(self):
-        credentials = None
-        
-        if os.path.exists(self.token_path):
+    def output_rate(self):
+        """Native sample rate of the default output device (cached)"""
+        if self._output_rate is None:
             try:
-                with open(self.token_path, 'r') as f:
-                    token_data = json.load(f)
-                    
-                with open(self.credentials_path, 'r') as f:
-                    cred_data = json.load(f)
-                    
-                credentials = google.oauth2.credentials.Credentials(
-                    token=token_data.get('token'),
-                    refresh_token=token_data.get('refresh_token'),
-                    token_uri=cred_data['installed']['token_uri'],
-                    client_id=cred_data['installed']['client_id'],
-                    client_secret=cred_data['installed']['client_secret'],
-                    scopes=self.SCOPES
+                self._output_rate = int(self.audio.get_default_output_device_info()['defaultSampleRate'])
+            except (IOError, OSError, KeyError, ValueError):
+                self._output_rate = self.sample_rate
+        return self._output_rate
+
+    def _post_processor(self, rate):
+        """A fresh AudioPostProcessor for one response, resampling to rate"""
+        options = dict(self.post_process) if isinstance(self.post_process, dict) else {}
+        options.setdefault('output_rate', rate)
+        # Imported here so numpy is only loaded when post-processing is on
+        from audio_processing import AudioPostProcessor
+        return AudioPostProcessor(self.sample_rate, **options)
+
+    def _open_output(self, output, rate):
+        """Unstarted sink for one response"""
+        if output == 'speaker':
+            return StreamingPlayer(self.audio, rate=rate, prebuffer_ms=self.jitter_buffer_ms)
+        if output == 'null':
+            return NullSink(rate)
+        if callable(output):
+            return output(rate)
+        raise ValueError(f"Unknown audio output {output!r}; use 'speaker', 'null' or a sink factory")
+
+    def authenticate(self):
+        """Return cached credentials, loading them from disk on first use"""
+        return self.credential_manager.load()
+
+    def _auth_metadata(self, context, callback):
+        """gRPC metadata plugin: attach the current access token to each call"""
+        callback([('authorization', f'Bearer {self.credential_manager.token}')], None)
+
+    def _get_stub(self):
+        """Return a stub from the shared channel pool, creating the pool on first use"""
+        return self._get_channel_pool().get_stub()
+
+    def _get_channel_pool(self):
+        with self._lock:
+            if self._channel_pool is None:
+                composite_credentials = grpc.composite_channel_credentials(
+                    channel_credentials(self.insecure, self.root_certificates),
+                    grpc.metadata_call_credentials(self._auth_metadata)
                 )
-            except Exception as e:
-                print(f"Error loading credentials: {e}")
-                credentials = None
+                self._channel_pool = ChannelPool(
+                    self.api_endpoint,
+                    composite_credentials,
+                    size=self.channel_pool_size,
+                    metrics=self.metrics
+                )
+            return self._channel_pool
+
+    def prewarm(self, timeout=10.0):
+        """Load credentials, connect every pooled channel and open the audio device now
+
+        The three run in parallel so the first command costs the same as any
+        later one. Returns a list of PrewarmStep; a failed step only means the
+        first command pays for it as before.
+        """
+        steps = self._prewarm_steps(timeout)
 
-        if not credentials or not credentials.valid:
+        def run(step):
+            name, warm = step
+            started = time.perf_counter()
             try:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_path,
-                    scopes=self.SCOPES
-                )
-                credentials = flow.run_local_server(port=0)
-                
-                token_data = {
-                    'token': credentials.token,
-                    'refresh_token': credentials.refresh_token
-                }
-                with open(self.token_path, 'w') as f:
-                    json.dump(token_data, f)
+                warm()
+                error = None
             except Exception as e:
-                print(f"Error during authentication: {e}")
-                raise
+                error = e
+            return PrewarmStep(name, time.perf_counter() - started, error)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(steps)) as executor:
+            return list(executor.map(run, steps))
+
+    def _prewarm_steps(self, timeout):
+        """(name, callable) pairs that prewarm() runs in parallel"""
+        steps = [
+            ('credentials', self.authenticate),
+            ('channel', lambda: self._get_channel_pool().warm(timeout)),
+        ]
+        if self.output == 'speaker':
+            steps.append(('audio', self._warm_audio))
+        return steps
+
+    def start_prewarm(self, on_ready=None, timeout=10.0):
+        """prewarm() on a background thread; on_ready(steps) is called when it is done"""
+        def prewarm_thread():
+            steps = self.prewarm(timeout)
+            if on_ready is not None:
+                on_ready(steps)
+
+        thread = threading.Thread(target=prewarm_thread, daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_audio(self):
+        """Initialize PortAudio and open/close an output stream at the playback rate"""
+        rate = self.output_rate() if self.post_process else self.sample_rate
+        stream = self.audio.open(
+            format=self.audio.get_format_from_width(2),
+            channels=1,
+            rate=rate,
+            output=True
+        )
+        stream.stop_stream()
+        stream.close()
+
+    def query(self, command, on_audio=None, keep_audio=True, timeout=None, control=None):
+        """Run one Assist call without playback and return an AssistResult
 
-        return credentials
+        Each audio chunk is passed to `on_audio` as soon as it arrives. With
+        keep_audio=False the chunks are only retained when the cache needs them.
+        `timeout` is the RPC deadline in seconds; `control` (a CallControl)
+        lets another thread cancel the call.
+        """
+        cache_key = None
+        if self.cache is not None and self.cache.cacheable(command):
+            cache_key = self.cache.make_key(
+                command,
+                self.language_code,
+                self.audio_encoding,
+                self.sample_rate,
+                self.volume_percentage
+            )
+            entry = self.cache.get(cache_key)
+            if entry is not None:
+                # Cache hit: no credentials, no channel, no round trip
+                if on_audio is not None:
+                    on_audio(entry.audio)
+                result = AssistResult.from_cache(command, entry)
+                if self.metrics is not None:
+                    self.metrics.observe_result(result)
+                return result
+        
+        timeout = self._admit(timeout, control)
+        try:
+            result = self._assist_text(command, on_audio, keep_audio or cache_key is not None,
+                                       timeout, control)
+        except grpc.RpcError as e:
+            self._limiter_feedback(e)
+            raise
+        self._limiter_feedback()
+        if cache_key is not None and result.audio_bytes:
+            self.cache.put(cache_key, b''.join(result.chunks), ' '.join(result.text))
+        return result
 
-    def send_command(self, command):
-        """Send command and play audio response"""
+    def _admit(self, timeout, control):
+        """Wait for a rate limiter slot; returns what is left of timeout
+
+        Raises rate_limiter.RateLimited when the command is shed locally.
+        """
+        if self.rate_limiter is None:
+            return timeout
+        waited = self.rate_limiter.acquire(timeout, control)
+        return None if timeout is None else max(0.0, timeout - waited)
+
+    def _admit_hedge(self, control):
+        """Take a rate limiter slot for a hedge only if one is free now; a hedge that waits is no use"""
         try:
-            credentials = self.authenticate()
+            self._admit(0.0, control)
+            return True
+        except RateLimited:
+            return False
+
+    def _limiter_feedback(self, error=None):
+        """Tell the rate limiter how an admitted call went"""
+        if self.rate_limiter is None:
+            return
+        if error is None:
+            self.rate_limiter.on_success()
+        elif error.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            self.rate_limiter.on_quota_error()
+
+    def _assist_text(self, command, on_audio, keep_audio, timeout, control):
+        """Run a text query under self.retry_policy and return the AssistResult that answered
+
+        An attempt is retried only if it failed with a retryable status before
+        any response arrived, and there is time and attempts left. `timeout`
+        bounds all attempts and backoffs together. Each retry takes its own
+        rate limiter slot; if none is available the last error is raised.
+        """
+        policy = self.retry_policy
+        request = self._build_request(command)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            attempt_timeout = policy.attempt_deadline(remaining)
+            if policy.hedge_after is None:
+                result, error = self._attempt(command, request, on_audio, keep_audio,
+                                              attempt_timeout, control)
+            else:
+                result, error = self._hedged_attempt(command, request, on_audio, keep_audio,
+                                                     attempt_timeout, control)
+            if error is None:
+                return result
             
-            channel_credentials = grpc.ssl_channel_credentials()
-            auth_credentials = grpc.metadata_call_credentials(
-                lambda context, callback: callback([
-                    ('authorization', f'Bearer {credentials.token}')
-                ], None)
-            )
+            if (control is not None and control.cancelled) or result.first_chunk_at is not None:
+                raise error
+            if not policy.is_retryable(error) or attempt >= policy.max_attempts:
+                raise error
+            delay = policy.backoff(attempt)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise error
             
-            composite_credentials = grpc.composite_channel_credentials(
-                channel_credentials, auth_credentials
+            print(f"Attempt {attempt} failed ({error.code().name}), retrying in {delay * 1000:.0f} ms")
+            wake = threading.Event()
+            if control is not None:
+                control.on_cancel(wake.set)
+            if wake.wait(delay):
+                raise error
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                self._admit(remaining, control)
+            except RateLimited:
+                raise error
+            if self.metrics is not None:
+                self.metrics.count('retries_total')
+
+    def _attempt(self, command, request, on_audio, keep_audio, timeout, control):
+        """One Assist call; returns (result, None) or (result, grpc.RpcError)"""
+        result = AssistResult(command)
+        try:
+            self._run_assist(result, iter([request]), on_audio, keep_audio,
+                             timeout=timeout, control=control)
+            return result, None
+        except grpc.RpcError as e:
+            return result, e
+
+    def _hedged_attempt(self, command, request, on_audio, keep_audio, timeout, control):
+        """An attempt plus, if it has not answered within hedge_after, a parallel second one
+
+        Whichever produces a response first wins: only its audio reaches
+        on_audio and the other call is cancelled. The hedge is only sent if
+        the rate limiter has a slot free right away. Returns (result, error)
+        of the winner, or of the last attempt to end if neither answered.
+        """
+        cond = threading.Condition()
+        attempts = []
+        state = {'winner': None, 'running': 0, 'last': None}
+
+        def launch():
+            """Start an attempt; False if another attempt has already won"""
+            result = AssistResult(command)
+            attempt_control = CallControl()
+            attempt = {'result': result, 'control': attempt_control, 'error': None}
+
+            def on_response(response):
+                if state['winner'] is not None or result.first_chunk_at is None:
+                    return
+                with cond:
+                    if state['winner'] is None:
+                        state['winner'] = attempt
+                        cond.notify_all()
+                if state['winner'] is attempt:
+                    for other in attempts:
+                        if other is not attempt:
+                            other['control'].cancel()
+
+            def forward(chunk):
+                if state['winner'] is attempt:
+                    on_audio(chunk)
+
+            def run():
+                try:
+                    self._run_assist(result, iter([request]), forward if on_audio is not None else None,
+                                     keep_audio, on_response, timeout=timeout, control=attempt_control)
+                except Exception as e:
+                    attempt['error'] = e
+                with cond:
+                    state['running'] -= 1
+                    state['last'] = attempt
+                    cond.notify_all()
+
+            with cond:
+                # Checked under the lock the winner is claimed with: either the
+                # winner's cancel loop sees this attempt, or it is never started
+                if state['winner'] is not None:
+                    return False
+                attempts.append(attempt)
+                state['running'] += 1
+            if control is not None:
+                control.on_cancel(attempt_control.cancel)
+            attempt['thread'] = threading.Thread(target=run, daemon=True)
+            attempt['thread'].start()
+            return True
+
+        def settled():
+            return state['winner'] is not None or state['running'] == 0
+
+        launch()
+        with cond:
+            cond.wait_for(settled, timeout=self.retry_policy.hedge_after)
+            hedge = not settled()
+        if hedge and not (control is not None and control.cancelled) and self._admit_hedge(control):
+            if launch() and self.metrics is not None:
+                self.metrics.count('hedges_total')
+        with cond:
+            cond.wait_for(settled)
+            winner = state['winner'] or state['last']
+        
+        # The winner keeps streaming on its own thread; wait for the whole answer
+        winner['thread'].join()
+        if winner is not attempts[0] and state['winner'] is winner and self.metrics is not None:
+            self.metrics.count('hedge_wins_total')
+        return winner['result'], winner['error']
+
+    def query_voice(self, source, vad=None, on_audio=None, keep_audio=True, timeout=None, control=None):
+        """Stream a spoken command from source and return an AssistResult
+
+        Frames from `source` (LINEAR16 mono at source.sample_rate, or
+        self.sample_rate if it has none; see audio_input) are sent as they
+        are captured. The upload stops when `vad`
+        reports the end of speech, the Assistant signals END_OF_UTTERANCE, or
+        the source runs out. Spoken commands can't be replayed, so they are
+        never retried or hedged.
+        """
+        result = AssistResult(None)
+        end_of_utterance = threading.Event()
+
+        def requests():
+            yield self._build_request(
+                None,
+                audio_in_config=embedded_assistant_pb2.AudioInConfig(
+                    encoding=embedded_assistant_pb2.AudioInConfig.LINEAR16,
+                    sample_rate_hertz=getattr(source, 'sample_rate', self.sample_rate)
+                )
             )
+            for frame in source:
+                if end_of_utterance.is_set():
+                    break
+                yield embedded_assistant_pb2.AssistRequest(audio_in=frame)
+                if vad is not None and vad.update(frame):
+                    break
+
+        def on_response(response):
+            if response.event_type == embedded_assistant_pb2.AssistResponse.END_OF_UTTERANCE:
+                end_of_utterance.set()
+
+        timeout = self._admit(timeout, control)
+        try:
+            self._run_assist(result, requests(), on_audio, keep_audio, on_response,
+                             timeout=timeout, control=control)
+        except grpc.RpcError as e:
+            self._limiter_feedback(e)
+            raise
+        finally:
+            # Stops the upload at the next frame if the call ended early
+            end_of_utterance.set()
+        self._limiter_feedback()
+        return result
+
+    def _build_request(self, command, audio_in_config=None):
+        return build_assist_request(
+            command,
+            self.device_id,
+            self.device_model_id,
+            self.language_code,
+            encoding=self.audio_encoding,
+            sample_rate_hertz=self.sample_rate,
+            volume_percentage=self.volume_percentage,
+            audio_in_config=audio_in_config
+        )
+
+    def _run_assist(self, result, requests, on_audio, keep_audio, on_response=None,
+                    timeout=None, control=None):
+        """Run one Assist call, filling result as responses stream in"""
+        self.authenticate()
+        result.authenticated_at = time.perf_counter()
+        assistant = self._get_stub()
+        result.stub_ready_at = time.perf_counter()
+        
+        try:
+            responses = assistant.Assist(requests, timeout=timeout)
+            result.request_sent_at = time.perf_counter()
+            if control is not None:
+                control.on_cancel(responses.cancel)
+            for response in responses:
+                result.add_response(response, keep_audio)
+                if on_response is not None:
+                    on_response(response)
+                chunk = response.audio_out.audio_data
+                if chunk and on_audio is not None:
+                    on_audio(chunk)
+        except Exception:
+            # A cancelled call (user cancel or a hedge that lost) is not an error
+            if self.metrics is not None and not (control is not None and control.cancelled):
+                self.metrics.count('errors_total')
+            raise
+        
+        result.finished_at = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.observe_result(result)
+
+    @property
+    def last_result(self):
+        """AssistResult of the last send_command made on the calling thread"""
+        return getattr(self._thread_state, 'result', None)
+
+    def send_command(self, command, stream_audio=None, play=True, output=None,
+                     timeout=None, control=None):
+        """Send command and play audio response (play=False only fetches it)
+
+        `output` overrides the client's output for this call ('speaker',
+        'null', or a factory such as `lambda rate: WavFileSink(path, rate)`).
+        `timeout` is the RPC deadline in seconds. `control.cancel()` from
+        another thread stops both the RPC and the playback.
+        """
+        def fetch(on_audio, keep_audio):
+            return self.query(command, on_audio=on_audio, keep_audio=keep_audio,
+                              timeout=timeout, control=control)
+        return self._send(fetch, stream_audio, play, output, control)
+
+    def send_voice_command(self, source, vad=None, stream_audio=None, play=True, output=None,
+                           timeout=None, control=None):
+        """Stream a spoken command from source (see audio_input) and play the answer"""
+        def fetch(on_audio, keep_audio):
+            result = self.query_voice(source, vad=vad, on_audio=on_audio, keep_audio=keep_audio,
+                                      timeout=timeout, control=control)
+            if result.transcript:
+                print(f"Recognized: {result.transcript}")
+            return result
+        return self._send(fetch, stream_audio, play, output, control)
+
+    def _send(self, fetch, stream_audio, play, output=None, control=None):
+        if stream_audio is None:
+            stream_audio = self.stream_audio
+        output = output or self.output
+        speaker = output == 'speaker'
+        sink = None
+        decoder = None
+        processor = None
+        self._thread_state.result = None
+        
+        try:
+            on_audio = None
+            pcm_chunks = []
+            rate = self.sample_rate
+            if play:
+                if self.post_process:
+                    # Only a real device benefits from resampling to its native rate
+                    processor = self._post_processor(self.output_rate() if speaker else rate)
+                    rate = processor.output_rate
+                if stream_audio or not speaker:
+                    # Started before the call so time-to-first-audio covers the whole round trip
+                    sink = self._open_output(output, rate).start()
+                    if control is not None:
+                        control.on_cancel(sink.stop)
+                    emit = sink.feed
+                else:
+                    emit = pcm_chunks.append
+                on_audio = emit
+                if processor is not None:
+                    def on_audio(chunk):
+                        pcm = processor.process(chunk)
+                        if pcm:
+                            emit(pcm)
+                if self.audio_encoding != LINEAR16:
+                    # Compressed answers are decoded to PCM as they arrive
+                    decoder = StreamingDecoder(
+                        self.audio_encoding,
+                        on_pcm=on_audio,
+                        sample_rate=self.sample_rate
+                    ).start()
+                    if control is not None:
+                        control.on_cancel(decoder.abort)
+                    on_audio = decoder.feed
             
-            with grpc.secure_channel(self.api_endpoint, composite_credentials) as channel:
-                assistant = embedded_assistant_pb2_grpc.EmbeddedAssistantStub(channel)
-                
-                config = embedded_assistant_pb2.AssistConfig(
-                    text_query=command,
-                    audio_out_config=embedded_assistant_pb2.AudioOutConfig(
-                        encoding=1,  # LINEAR16
-                        sample_rate_hertz=16000,
-                        volume_percentage=100,
-                    ),
-                    dialog_state_in=embedded_assistant_pb2.DialogStateIn(
-                        language_code=self.language_code,
-                        conversation_state=b'',
-                        is_new_conversation=True
-                    ),
-                    device_config=embedded_assistant_pb2.DeviceConfig(
-                        device_id=self.device_id,
-                        device_model_id=self.device_model_id
-                    )
-                )
-                
-                request = embedded_assistant_pb2.AssistRequest(config=config)
-                responses = assistant.Assist(iter([request]))
-                
-                print("Processing responses...")
-                audio_data = b''
-                
-                for response in responses:
-                    if response.audio_out.audio_data:
-                        audio_data += response.audio_out.audio_data
+            print("Processing responses...")
+            result = fetch(on_audio, False)
+            self._thread_state.result = result
+            if decoder is not None:
+                decoder.finish()
+                decoder = None
+            if processor is not None:
+                pcm = processor.flush()
+                if pcm:
+                    emit(pcm)
+            
+            if sink is not None:
+                stats = self.last_playback_stats = sink.finish()
+                sink = None
+                if result.audio_bytes:
+                    if speaker:
+                        print(f"Playback finished: {stats.summary()}")
+                    if self.metrics is not None:
+                        # None when nothing reached the sink (device failed, or all trimmed)
+                        if stats.time_to_first_audio is not None:
+                            self.metrics.observe('playback_start', stats.time_to_first_audio)
+                        self.metrics.observe('playback_end', stats.finished_at - stats.started_at)
+            elif play and result.audio_bytes and not (control is not None and control.cancelled):
+                print("Playing audio response...")
+                if self.metrics is not None:
+                    self.metrics.observe('playback_start', time.perf_counter() - result.started_at)
+                self.play_audio(memoryview(b''.join(pcm_chunks)), rate)
+                if self.metrics is not None:
+                    self.metrics.observe('playback_end', time.perf_counter() - result.started_at)
+            
+            if result.audio_bytes:
+                return True
+            else:
+                print("No audio response received")
+                return False
                 
-                if audio_data:
-                    print("Playing audio response...")
-                    self.play_audio(audio_data)
-                    return True
-                else:
-                    print("No audio response received")
-                    return False
-                    
         except Exception as e:
+            if control is not None and control.cancelled:
+                print("Command cancelled")
+                return False
             print(f"Error during command execution: {e}")
             if hasattr(e, 'details'):
                 print(f"Error details: {e.details()}")
             return False
+        
+        finally:
+            if decoder is not None:
+                decoder.abort()
+            if sink is not None:
+                self.last_playback_stats = sink.stop()
 
     def cleanup(self):
-        """Cleanup audio resources"""
-        self.audio.terminate()
+        """Cleanup audio and network resources"""
+        if self._channel_pool is not None:
+            self._channel_pool.close()
+            self._channel_pool = None
+        self.credential_manager.close()
+        if self._audio is not None:
+            self._audio.terminate()
+
+def read_commands(source):
+    """Read one command per line from a file path, or stdin for '-'"""
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+def run_batch(assistant, commands, output_dir, concurrency=4):
+    """Run commands concurrently, saving each answer to a file and a JSONL record
+
+    Writes <output_dir>/NNNNN.wav per command (.mp3/.ogg, undecoded, when the
+    client asks for compressed audio) and appends one record per
+    command (in completion order) to <output_dir>/results.jsonl. Returns the
+    number of commands that produced audio.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, 'results.jsonl')
+    write_lock = threading.Lock()
+
+    def run_one(index, command):
+        audio_path = os.path.join(output_dir, f'{index:05d}.{file_extension(assistant.audio_encoding)}')
+        record = {'index': index, 'command': command, 'audio_file': audio_path, 'ok': False}
+        started = time.perf_counter()
+        try:
+            if assistant.audio_encoding == LINEAR16:
+                sink = WavFileSink(audio_path, assistant.sample_rate).start()
+                try:
+                    result = assistant.query(command, on_audio=sink.feed, keep_audio=False)
+                finally:
+                    sink.finish()
+            else:
+                with open(audio_path, 'wb') as audio_file:
+                    result = assistant.query(command, on_audio=audio_file.write, keep_audio=False)
+            record.update(result.to_record())
+            record['ok'] = result.audio_bytes > 0
+        except Exception as e:
+            record['error'] = str(e)
+            record['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        with write_lock:
+            with open(results_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        return record['ok']
 
-def main():
+    print(f"Running {len(commands)} commands with concurrency {concurrency}...")
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        succeeded = sum(executor.map(run_one, range(len(commands)), commands))
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {succeeded}/{len(commands)} succeeded in {elapsed:.1f}s "
+          f"({len(commands) / elapsed:.1f} commands/s). Results in {results_path}")
+    return succeeded
+
+def add_client_arguments(parser):
+    """Flags that configure a GoogleAssistantClient, shared with assistant_daemon.py"""
+    parser.add_argument('--endpoint', default=API_ENDPOINT,
+                        help="Assistant API host:port, e.g. a local mock_server.py")
+    parser.add_argument('--insecure', action='store_true',
+                        help="use plaintext to a local --endpoint")
+    parser.add_argument('--root-cert', metavar='PEM',
+                        help="trust this certificate for a local TLS --endpoint")
+    parser.add_argument('--static-token', metavar='TOKEN',
+                        help="send TOKEN instead of OAuth credentials (local servers only)")
+    parser.add_argument('--audio-encoding', choices=list(ENCODINGS), default='linear16',
+                        help="audio format requested from the Assistant; mp3/opus use less "
+                             "bandwidth and are decoded locally with ffmpeg")
+    parser.add_argument('--retries', type=int, default=3, metavar='N',
+                        help="attempts per text command on transient errors (default: 3)")
+    parser.add_argument('--attempt-timeout', type=float, default=STREAM_TIMEOUT, metavar='SECONDS',
+                        help="gRPC deadline for each attempt. It covers the whole streamed answer, "
+                             "not just the first response, so keep it above the longest answer "
+                             f"(default: {STREAM_TIMEOUT:.0f})")
+    parser.add_argument('--hedge-ms', type=float, metavar='MS',
+                        help="start a second attempt if the first has not answered within MS")
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help="record per-phase latency histograms and write them to PATH "
+                             "in Prometheus text format")
+    parser.add_argument('--cache', action='store_true',
+                        help="answer repeated, non time-sensitive queries from a local cache")
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help="also keep cached answers in DIR so they survive restarts (implies --cache)")
+    parser.add_argument('--cache-max-disk', type=int, default=1024, metavar='N',
+                        help="answers --cache-dir keeps; the oldest are deleted first (default: 1024)")
+    parser.add_argument('--rate', type=float, metavar='PER_SECOND',
+                        help="send at most this many commands per second; slows down on quota "
+                             "errors (default: unlimited)")
+    parser.add_argument('--burst', type=int, default=10,
+                        help="commands --rate lets through at once after a quiet period (default: 10)")
+    parser.add_argument('--max-queue', type=int, default=32,
+                        help="commands that may wait for --rate at once; more are refused (default: 32)")
+    parser.add_argument('--max-wait', type=float, default=5.0, metavar='SECONDS',
+                        help="refuse a command instead of queueing it longer than this (default: 5)")
+    parser.add_argument('--devices', metavar='FILE',
+                        help="spread commands across the device/token profiles listed in FILE "
+                             "(see device_shards.py)")
+    parser.add_argument('--shard-strategy', choices=['least_loaded', 'round_robin'], default='least_loaded',
+                        help="how --devices picks a device for each command (default: least_loaded)")
+
+def client_from_args(args, metrics=None, **options):
+    """GoogleAssistantClient configured by the add_client_arguments() flags
+
+    `options` are passed through to the client (channel_pool_size, output, ...).
+    """
+    cache = None
+    if args.cache or args.cache_dir:
+        cache = ResponseCache(path=args.cache_dir, max_disk_entries=args.cache_max_disk)
+    root_certificates = None
+    if args.root_cert:
+        with open(args.root_cert, 'rb') as f:
+            root_certificates = f.read()
+    client_class = GoogleAssistantClient
+    if args.devices:
+        # Imported here: device_shards builds on this module
+        from device_shards import ShardedAssistantClient, load_profiles
+        client_class = ShardedAssistantClient
+        options.update(profiles=load_profiles(args.devices), strategy=args.shard_strategy)
+    return client_class(
+        cache=cache,
+        api_endpoint=args.endpoint,
+        insecure=args.insecure,
+        root_certificates=root_certificates,
+        credential_manager=StaticCredentialManager(args.static_token) if args.static_token else None,
+        metrics=metrics,
+        audio_encoding=args.audio_encoding,
+        retry_policy=RetryPolicy(
+            max_attempts=args.retries,
+            attempt_timeout=args.attempt_timeout,
+            hedge_after=args.hedge_ms / 1000 if args.hedge_ms else None
+        ),
+        rate_limiter=RateLimiter(
+            args.rate,
+            burst=args.burst,
+            max_queue=args.max_queue,
+            max_wait=args.max_wait
+        ) if args.rate else None,
+        **options
+    )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Google Assistant text client")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="run commands from FILE ('-' for stdin) instead of the interactive prompt")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="number of batch commands in flight at once (default: 4)")
+    parser.add_argument('--output-dir', default='batch_output',
+                        help="where batch mode writes WAV files and results.jsonl")
+    add_client_arguments(parser)
+    parser.add_argument('--post-process', action='store_true',
+                        help="trim silence, normalize loudness and resample to the speaker's "
+                             "native rate before playback (needs numpy)")
+    parser.add_argument('--output', default='speaker', metavar='speaker|null|FILE.wav',
+                        help="where answers go: the speaker (default), nowhere, or a WAV file "
+                             "rewritten for each answer")
+    parser.add_argument('--prewarm', action='store_true',
+                        help="load credentials, connect and open the audio device in the "
+                             "background at startup so the first command is not slower")
+    parser.add_argument('--voice', action='store_true',
+                        help="speak commands into the microphone instead of typing them")
+    parser.add_argument('--voice-wav', metavar='FILE',
+                        help="send FILE (16 kHz 16-bit mono WAV) as one spoken command and exit")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
     try:
         print("Initializing Google Assistant Client...")
-        assistant = GoogleAssistantClient()
+        print(f"Using {describe_backend()}")
+        metrics = None
+        if args.metrics_file:
+            metrics = Metrics()
+            metrics.start_exporter(args.metrics_file)
+        output = args.output
+        if output not in ('speaker', 'null'):
+            path = output
+            output = lambda rate: WavFileSink(path, rate)
+        # One HTTP/2 connection carries ~100 concurrent streams; add channels beyond that
+        assistant = client_from_args(
+            args,
+            metrics=metrics,
+            channel_pool_size=max(2, args.concurrency // 64),
+            post_process=args.post_process,
+            output=output
+        )
+        cache = assistant.cache
         
         try:
+            if args.prewarm:
+                print("Prewarming in the background...")
+                assistant.start_prewarm(
+                    on_ready=lambda steps: print(f"\nReady: {prewarm_summary(steps)}")
+                )
+            
+            if args.batch:
+                run_batch(assistant, read_commands(args.batch), args.output_dir, args.concurrency)
+                if cache is not None:
+                    print(f"Response cache: {cache.stats()}")
+                return
+
+            if args.voice_wav:
+                source = WavFileSource(args.voice_wav, sample_rate=assistant.sample_rate)
+                assistant.send_voice_command(source, vad=EnergyVAD(sample_rate=source.sample_rate))
+                return
+
+            if args.voice:
+                while True:
+                    command = input("\nPress Enter and speak (or type 'exit' to quit): ")
+                    if command.lower() == 'exit':
+                        break
+                    print("Listening...")
+                    source = MicrophoneSource(assistant.audio, sample_rate=assistant.sample_rate)
+                    assistant.send_voice_command(source, vad=EnergyVAD(sample_rate=source.sample_rate))
+                return
+
             while True:
                 command = input("\nEnter your command (or 'exit' to quit): ")
                 
@@ -182,6 +1272,9 @@ def main():
                 
         finally:
             assistant.cleanup()
+            if metrics is not None:
+                metrics.stop_exporter()
+                metrics.write_prometheus(args.metrics_file)
             
     except KeyboardInterrupt:
         print("\nExiting...")
@@ -190,4 +1283,4 @@ def main():
         print("\nTry removing token.json and running register_device.py again if authentication fails.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,343 @@
+# assistant_daemon.py
+"""Long-running local service that shares one GoogleAssistantClient
+
+Every tool on the machine can send text commands over HTTP instead of
+starting its own process with its own credentials, channels and audio
+stack. All callers share one credential manager, one channel pool and one
+response cache.
+
+    python assistant_daemon.py --port 8765
+    curl -N -d '{"command": "what time is it"}' http://127.0.0.1:8765/assist
+
+POST /assist takes {"command": ..., "timeout": seconds} and streams back
+newline-delimited JSON events as they arrive:
+
+    {"type": "start", "encoding": "linear16", "sample_rate": 16000}
+    {"type": "audio", "data": "<base64 audio chunk>"}    (repeated)
+    {"type": "done", "text": ..., "total_ms": ..., ...}  (or "error")
+
+Audio is passed through in the encoding the API returned (LINEAR16 PCM,
+or MP3/Opus with --audio-encoding). GET /health reports load, and GET
+/metrics returns Prometheus text. A caller that disconnects cancels its
+Assist call.
+"""
+import argparse
+import base64
+import hmac
+import http.client
+import http.server
+import json
+import os
+import threading
+import time
+
+import grpc
+from assistant_client import (
+    CallControl,
+    add_client_arguments,
+    client_from_args,
+    prewarm_summary
+)
+from assistant_protos import describe_backend
+from audio_decoder import ENCODINGS
+from metrics import Metrics
+from retry_policy import STREAM_TIMEOUT
+
+DEFAULT_PORT = 8765
+
+# Requests larger than this are refused before the body is read
+MAX_BODY_BYTES = 64 * 1024
+
+class AssistantDaemon:
+    """HTTP front end for a shared GoogleAssistantClient
+
+    At most max_concurrent commands run at once; further requests get 503
+    with Retry-After rather than queueing without bound. Set auth_token to
+    require "Authorization: Bearer <token>" on every request.
+    """
+
+    def __init__(self, assistant, host='127.0.0.1', port=DEFAULT_PORT, max_concurrent=16,
+                 command_timeout=STREAM_TIMEOUT, auth_token=None):
+        self.assistant = assistant
+        self.command_timeout = command_timeout
+        self.auth_token = auth_token
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.served = 0
+        self.started_at = time.time()
+        self.server = http.server.ThreadingHTTPServer((host, port), self._handler_class())
+
+    @property
+    def address(self):
+        """(host, port) actually bound; port 0 picks a free one"""
+        return self.server.server_address[:2]
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def start(self):
+        """Serve on a background thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def health(self):
+        with self._lock:
+            health = {
+                'status': 'ok',
+                'active': self.active,
+                'max_concurrent': self.max_concurrent,
+                'served': self.served,
+                'uptime_s': round(time.time() - self.started_at, 1),
+            }
+        if self.assistant.rate_limiter is not None:
+            health['rate_limiter'] = self.assistant.rate_limiter.stats()
+        if hasattr(self.assistant, 'shard_health'):
+            health['devices'] = self.assistant.shard_health()
+        return health
+
+    def _handler_class(self):
+        daemon = self
+
+        class Handler(AssistantRequestHandler):
+            pass
+
+        Handler.daemon = daemon
+        return Handler
+
+class AssistantRequestHandler(http.server.BaseHTTPRequestHandler):
+    """One HTTP request; self.daemon is the AssistantDaemon it serves"""
+
+    # Keep-alive and chunked responses
+    protocol_version = 'HTTP/1.1'
+    daemon = None
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == '/health':
+            self._send_json(200, self.daemon.health())
+        elif self.path == '/metrics':
+            metrics = self.daemon.assistant.metrics
+            body = (metrics.render_prometheus() if metrics is not None else '').encode('utf-8')
+            self._send_body(200, 'text/plain; version=0.0.4', body)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path != '/assist':
+            # The body is left unread: don't let it be parsed as the next request
+            self.close_connection = True
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            # Without a usable length the body can't be skipped either
+            self.close_connection = True
+            self._send_json(400, {'error': 'invalid Content-Length'})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {'error': 'request too large'})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+            command = request['command'].strip()
+            timeout = float(request.get('timeout') or self.daemon.command_timeout)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self._send_json(400, {'error': 'expected JSON {"command": "...", "timeout": seconds}'})
+            return
+        if not command:
+            self._send_json(400, {'error': 'empty command'})
+            return
+
+        daemon = self.daemon
+        if not daemon._slots.acquire(blocking=False):
+            self._send_json(503, {'error': 'busy'}, {'Retry-After': '1'})
+            return
+        with daemon._lock:
+            daemon.active += 1
+        try:
+            self._stream_assist(command, timeout)
+        finally:
+            with daemon._lock:
+                daemon.active -= 1
+                daemon.served += 1
+            daemon._slots.release()
+
+    def _stream_assist(self, command, timeout):
+        """Run the command and write its events as chunked NDJSON"""
+        assistant = self.daemon.assistant
+        control = CallControl()
+        write_lock = threading.Lock()
+        state = {'disconnected': False}
+
+        def send_event(event):
+            if state['disconnected']:
+                return
+            line = json.dumps(event).encode('utf-8') + b'\n'
+            try:
+                with write_lock:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                    self.wfile.flush()
+            except OSError:
+                # The caller went away: stop paying for its answer
+                state['disconnected'] = True
+                control.cancel()
+
+        def on_audio(chunk):
+            send_event({'type': 'audio', 'data': base64.b64encode(chunk).decode('ascii')})
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        encoding = next(name for name, value in ENCODINGS.items() if value == assistant.audio_encoding)
+        send_event({'type': 'start', 'encoding': encoding, 'sample_rate': assistant.sample_rate})
+
+        try:
+            result = assistant.query(command, on_audio=on_audio, keep_audio=False,
+                                     timeout=timeout, control=control)
+            done = {'type': 'done'}
+            done.update(result.to_record())
+            send_event(done)
+        except grpc.RpcError as e:
+            if state['disconnected']:
+                print(f"{self.address_string()} disconnected, cancelled {command!r}")
+                self.close_connection = True
+                return
+            send_event({'type': 'error', 'code': e.code().name, 'message': e.details()})
+        except Exception as e:
+            error = {'type': 'error', 'code': 'INTERNAL', 'message': str(e)}
+            if getattr(e, 'retry_after', None) is not None:
+                # Shed locally (e.g. every device cooling down): the caller may retry later
+                error.update(code='RESOURCE_EXHAUSTED', retry_after=round(e.retry_after, 1))
+            send_event(error)
+
+        if state['disconnected']:
+            self.close_connection = True
+            return
+        try:
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except OSError:
+            self.close_connection = True
+
+    def _authorized(self):
+        token = self.daemon.auth_token
+        if token is None:
+            return True
+        supplied = self.headers.get('Authorization', '')
+        if hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return True
+        # Any request body is left unread, so this connection can't be reused
+        self.close_connection = True
+        self._send_json(401, {'error': 'unauthorized'}, {'WWW-Authenticate': 'Bearer'})
+        return False
+
+    def _send_json(self, status, payload, headers=None):
+        self._send_body(status, 'application/json', json.dumps(payload).encode('utf-8'), headers)
+
+    def _send_body(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+def stream_query(command, host='127.0.0.1', port=DEFAULT_PORT, timeout=None, auth_token=None):
+    """Send a command to a running daemon and yield its events as dicts
+
+    Audio events carry the decoded bytes in event['audio'].
+    """
+    body = {'command': command}
+    if timeout is not None:
+        body['timeout'] = timeout
+    headers = {'Content-Type': 'application/json'}
+    if auth_token is not None:
+        headers['Authorization'] = f'Bearer {auth_token}'
+    connection = http.client.HTTPConnection(host, port, timeout=None if timeout is None else timeout + 5)
+    try:
+        connection.request('POST', '/assist', json.dumps(body), headers)
+        response = connection.getresponse()
+        if response.status != 200:
+            error = json.loads(response.read() or b'{}').get('error', response.reason)
+            raise RuntimeError(f"Daemon returned {response.status}: {error}")
+        for line in response:
+            event = json.loads(line)
+            if event['type'] == 'audio':
+                event['audio'] = base64.b64decode(event.pop('data'))
+            yield event
+    finally:
+        connection.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Shared Google Assistant service for local clients")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address to listen on (default: loopback only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-concurrent', type=int, default=16,
+                        help="commands in flight at once; more get 503 (default: 16)")
+    parser.add_argument('--command-timeout', type=float, default=STREAM_TIMEOUT,
+                        help="deadline for a command, including its whole streamed answer, "
+                             f"when the request sets none (default: {STREAM_TIMEOUT:.0f})")
+    parser.add_argument('--auth-token', default=os.environ.get('ASSISTANT_DAEMON_TOKEN'),
+                        help="require this bearer token (default: $ASSISTANT_DAEMON_TOKEN)")
+    add_client_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics = Metrics()
+    if args.metrics_file:
+        metrics.start_exporter(args.metrics_file)
+    print(f"Using {describe_backend()}")
+    # Audio goes back to the callers, so the daemon never opens a sound device
+    assistant = client_from_args(
+        args,
+        metrics=metrics,
+        channel_pool_size=max(2, args.max_concurrent // 64),
+        output='null'
+    )
+    try:
+        daemon = AssistantDaemon(
+            assistant,
+            host=args.host,
+            port=args.port,
+            max_concurrent=args.max_concurrent,
+            command_timeout=args.command_timeout,
+            auth_token=args.auth_token
+        )
+        assistant.start_prewarm(on_ready=lambda steps: print(f"Ready: {prewarm_summary(steps)}"))
+        host, port = daemon.address
+        print(f"Assistant daemon listening on http://{host}:{port}")
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            print("\nShutting down...")
+            daemon.server.server_close()
+    finally:
+        assistant.cleanup()
+        if args.metrics_file:
+            metrics.stop_exporter()
+            metrics.write_prometheus(args.metrics_file)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# assistant_protos.py
+"""Load the Embedded Assistant protos on the fastest protobuf backend available
+
+The modules shipped with google-assistant-grpc were generated by an old protoc
+and refuse to load on the upb/C++ backends of protobuf >= 4. Their serialized
+file descriptor still registers fine, so in that case the message classes are
+rebuilt from it on the fast backend. Only if that fails too do we fall back to
+the pure-Python backend, which parses audio-heavy responses much more slowly.
+"""
+import os
+import sys
+import types
+
+PROTO_PACKAGE = 'google.assistant.embedded.v1alpha2'
+PROTO_FILE = 'google/assistant/embedded/v1alpha2/embedded_assistant.proto'
+PB2_MODULE = f'{PROTO_PACKAGE}.embedded_assistant_pb2'
+
+# How the protos were loaded: 'generated', 'rebuilt' or 'python-fallback'
+load_mode = None
+
+def _rebuild_pb2():
+    """Build the pb2 module from the descriptor left in the default pool"""
+    import importlib
+    from google.protobuf import descriptor_pool
+    from google.protobuf.internal import builder
+
+    file_descriptor = descriptor_pool.Default().FindFileByName(PROTO_FILE)
+    module = types.ModuleType(PB2_MODULE)
+    module.DESCRIPTOR = file_descriptor
+    builder.BuildMessageAndEnumDescriptors(file_descriptor, module.__dict__)
+    builder.BuildTopDescriptorsAndMessages(file_descriptor, PB2_MODULE, module.__dict__)
+
+    sys.modules[PB2_MODULE] = module
+    setattr(importlib.import_module(PROTO_PACKAGE), 'embedded_assistant_pb2', module)
+    return module
+
+def _purge_protobuf_modules():
+    prefixes = ('google.protobuf', 'google._upb', 'google.api', 'google.type', 'google.assistant')
+    for name in list(sys.modules):
+        if name.startswith(prefixes):
+            del sys.modules[name]
+
+def _load():
+    global load_mode
+
+    try:
+        from google.assistant.embedded.v1alpha2 import embedded_assistant_pb2
+        load_mode = 'generated'
+    except TypeError as error:
+        # "Descriptors cannot be created directly": gencode older than the runtime
+        try:
+            embedded_assistant_pb2 = _rebuild_pb2()
+            load_mode = 'rebuilt'
+        except Exception as e:
+            print(f"Generated protos are incompatible with the {protobuf_backend()} "
+                  f"protobuf backend ({error.__class__.__name__}; rebuild failed: {e}). "
+                  "Falling back to the pure-Python backend.")
+            os.environ['PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION'] = 'python'
+            _purge_protobuf_modules()
+            from google.assistant.embedded.v1alpha2 import embedded_assistant_pb2
+            load_mode = 'python-fallback'
+
+    from google.assistant.embedded.v1alpha2 import embedded_assistant_pb2_grpc
+    return embedded_assistant_pb2, embedded_assistant_pb2_grpc
+
+def protobuf_backend():
+    """Name of the active protobuf backend: 'upb', 'cpp' or 'python'"""
+    from google.protobuf.internal import api_implementation
+    return api_implementation.Type()
+
+def describe_backend():
+    """One-line startup diagnostic"""
+    import google.protobuf
+    return f"protobuf {google.protobuf.__version__}, {protobuf_backend()} backend ({load_mode} modules)"
+
+embedded_assistant_pb2, embedded_assistant_pb2_grpc = _load()
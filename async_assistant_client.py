@@ -0,0 +1,141 @@
+# async_assistant_client.py
+import asyncio
+import collections
+import sys
+
+import grpc
+from assistant_client import (
+    API_ENDPOINT,
+    CHANNEL_OPTIONS,
+    CredentialManager,
+    build_assist_request,
+    channel_credentials,
+    load_device_config
+)
+from assistant_protos import embedded_assistant_pb2_grpc
+
+# One piece of an Assistant answer: kind is 'audio' (LINEAR16 bytes),
+# 'text' (supplemental display text) or 'transcript' (recognized speech)
+AssistChunk = collections.namedtuple('AssistChunk', ['kind', 'data'])
+
+class AsyncGoogleAssistantClient:
+    """Asyncio client for the Embedded Assistant API built on grpc.aio
+
+    All calls share one channel, which HTTP/2 multiplexes, so a single event
+    loop can drive many concurrent Assist streams without a thread each.
+    The channel is bound to the event loop that first uses the client.
+    """
+
+    def __init__(self, credential_manager=None, api_endpoint=None, insecure=False,
+                 root_certificates=None, device_config=None):
+        self.credentials_path = 'credentials.json'
+        self.token_path = 'token.json'
+        self.device_config_path = 'device_config.json'
+        self.api_endpoint = api_endpoint or API_ENDPOINT
+        self.insecure = insecure
+        self.root_certificates = root_certificates
+        self.language_code = 'en-US'
+        self.SCOPES = ['https://www.googleapis.com/auth/assistant-sdk-prototype']
+
+        self.credential_manager = credential_manager or CredentialManager(
+            self.credentials_path,
+            self.token_path,
+            self.SCOPES
+        )
+
+        config = device_config or load_device_config(self.device_config_path)
+        self.device_model_id = config['device_model_id']
+        self.device_id = config['device_id']
+
+        self._channel = None
+        self._stub = None
+        self._ready_lock = None
+
+    def _auth_metadata(self, context, callback):
+        """gRPC metadata plugin: attach the current access token to each call"""
+        callback([('authorization', f'Bearer {self.credential_manager.token}')], None)
+
+    async def _ensure_ready(self):
+        """Load credentials and open the shared channel on first use"""
+        if self._stub is not None:
+            return
+
+        if self._ready_lock is None:
+            self._ready_lock = asyncio.Lock()
+
+        async with self._ready_lock:
+            if self._stub is None:
+                # First load may hit disk or the token endpoint; keep it off the loop
+                await asyncio.get_running_loop().run_in_executor(None, self.credential_manager.load)
+
+                composite_credentials = grpc.composite_channel_credentials(
+                    channel_credentials(self.insecure, self.root_certificates),
+                    grpc.metadata_call_credentials(self._auth_metadata)
+                )
+                self._channel = grpc.aio.secure_channel(
+                    self.api_endpoint,
+                    composite_credentials,
+                    options=CHANNEL_OPTIONS
+                )
+                self._stub = embedded_assistant_pb2_grpc.EmbeddedAssistantStub(self._channel)
+
+    async def send_command(self, command, timeout=None):
+        """Send a text command and yield AssistChunk objects as they arrive
+
+        Use as `async for chunk in client.send_command(...)`. Leaving the loop
+        early cancels the underlying RPC.
+        """
+        await self._ensure_ready()
+
+        request = build_assist_request(
+            command,
+            self.device_id,
+            self.device_model_id,
+            self.language_code
+        )
+        call = self._stub.Assist(iter([request]), timeout=timeout)
+
+        try:
+            async for response in call:
+                for result in response.speech_results:
+                    if result.transcript:
+                        yield AssistChunk('transcript', result.transcript)
+                if response.dialog_state_out.supplemental_display_text:
+                    yield AssistChunk('text', response.dialog_state_out.supplemental_display_text)
+                if response.audio_out.audio_data:
+                    yield AssistChunk('audio', response.audio_out.audio_data)
+        finally:
+            call.cancel()
+
+    async def close(self):
+        """Close the channel and stop the credential refresher"""
+        if self._channel is not None:
+            await self._channel.close()
+            self._channel = None
+            self._stub = None
+        self.credential_manager.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+async def main(commands):
+    """Run commands concurrently and print what came back for each"""
+    async with AsyncGoogleAssistantClient() as assistant:
+
+        async def run(command):
+            audio_bytes = 0
+            text = []
+            async for chunk in assistant.send_command(command):
+                if chunk.kind == 'audio':
+                    audio_bytes += len(chunk.data)
+                else:
+                    text.append(chunk.data)
+            print(f"{command!r}: {audio_bytes} audio bytes {' '.join(text)}")
+
+        await asyncio.gather(*(run(command) for command in commands))
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1:] or ["What can you do?"]))
@@ -0,0 +1,148 @@
+# audio_decoder.py
+"""Incremental decoding of compressed Assistant audio into LINEAR16
+
+The Assistant can answer in MP3 or Opus-in-Ogg instead of raw LINEAR16,
+which cuts bytes on the wire several times over. Decoding runs in an ffmpeg
+subprocess fed through a pipe, so PCM comes out while the response is still
+arriving and decode CPU stays off the Python thread. ffmpeg is only needed
+when a compressed encoding is selected; set FFMPEG_BINARY to use a copy that
+is not on PATH.
+"""
+import collections
+import os
+import shutil
+import subprocess
+import threading
+
+# AudioOutConfig.Encoding values, by the names used on the command line
+ENCODINGS = {
+    'linear16': 1,
+    'mp3': 2,
+    'opus': 3,  # OPUS_IN_OGG
+}
+
+# ffmpeg demuxer and file extension for each compressed encoding
+_FORMATS = {
+    2: ('mp3', 'mp3'),
+    3: ('ogg', 'ogg'),
+}
+
+# Lines of ffmpeg's stderr kept for the error message
+STDERR_LINES = 20
+
+def encoding_value(encoding):
+    """Accept an AudioOutConfig.Encoding number or one of the ENCODINGS names"""
+    if isinstance(encoding, str):
+        try:
+            return ENCODINGS[encoding.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown audio encoding {encoding!r}; choose from {', '.join(ENCODINGS)}")
+    return encoding
+
+def file_extension(encoding):
+    """Extension for saving an undecoded response in this encoding"""
+    encoding = encoding_value(encoding)
+    return _FORMATS[encoding][1] if encoding in _FORMATS else 'wav'
+
+def find_ffmpeg():
+    """Path to ffmpeg, or None"""
+    return os.environ.get('FFMPEG_BINARY') or shutil.which('ffmpeg')
+
+class StreamingDecoder:
+    """Decodes compressed chunks to LINEAR16 mono as they are fed
+
+    Decoded PCM is delivered to on_pcm(bytes) from a reader thread, in
+    blocks of about `block_size` bytes.
+    """
+
+    def __init__(self, encoding, on_pcm, sample_rate=16000, block_size=3200, ffmpeg=None):
+        encoding = encoding_value(encoding)
+        if encoding not in _FORMATS:
+            raise ValueError(f"No decoder needed for encoding {encoding}")
+        self.encoding = encoding
+        self.on_pcm = on_pcm
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.ffmpeg = ffmpeg or find_ffmpeg()
+        if not self.ffmpeg:
+            raise RuntimeError("Compressed audio output needs ffmpeg; install it or set FFMPEG_BINARY")
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._process = None
+        self._reader = None
+        self._stderr_reader = None
+        self._stderr_tail = collections.deque(maxlen=STDERR_LINES)
+        self._error = None
+
+    def start(self):
+        demuxer = _FORMATS[self.encoding][0]
+        self._process = subprocess.Popen(
+            [self.ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin',
+             '-f', demuxer, '-i', 'pipe:0',
+             '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(self.sample_rate),
+             'pipe:1'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        self._reader = threading.Thread(target=self._read_pcm, daemon=True)
+        self._reader.start()
+        # A corrupt stream can make ffmpeg log more than a pipe buffer holds;
+        # unread, it would block on stderr and stop taking input from feed()
+        self._stderr_reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_reader.start()
+        return self
+
+    def feed(self, chunk):
+        """Pass one compressed chunk to the decoder"""
+        self.bytes_in += len(chunk)
+        try:
+            self._process.stdin.write(chunk)
+        except BrokenPipeError:
+            # ffmpeg exited; the reason is reported by finish()
+            pass
+
+    def finish(self):
+        """Flush the decoder and wait until all PCM has been delivered"""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join()
+        self._stderr_reader.join()
+        if self._process.wait() != 0 and self._error is None:
+            stderr = b''.join(self._stderr_tail).decode('utf-8', 'replace').strip()
+            self._error = stderr or f"ffmpeg exited with {self._process.returncode}"
+        if self._error:
+            raise RuntimeError(f"Error decoding audio: {self._error}")
+        return self.bytes_out
+
+    def abort(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+    def _read_pcm(self):
+        try:
+            # Keep blocks sample-aligned for the audio output
+            pending = b''
+            while True:
+                data = self._process.stdout.read(self.block_size)
+                if not data:
+                    break
+                data = pending + data
+                usable = len(data) - len(data) % 2
+                pending = data[usable:]
+                if usable:
+                    self.bytes_out += usable
+                    self.on_pcm(data[:usable])
+        except Exception as e:
+            self._error = str(e)
+            self.abort()
+
+    def _read_stderr(self):
+        """Drain ffmpeg's log as it is written, keeping only the last lines"""
+        for line in self._process.stderr:
+            self._stderr_tail.append(line)
@@ -0,0 +1,136 @@
+# audio_input.py
+"""Audio sources and voice-activity detection for voice commands
+
+A source is any iterable of LINEAR16 mono frames (bytes). The client streams
+them to the Assistant as they are produced, so recognition runs while the
+user is still speaking; EnergyVAD ends the stream once they stop.
+"""
+import array
+import math
+import sys
+import time
+import wave
+
+class MicrophoneSource:
+    """Frames from the default input device via PyAudio"""
+
+    def __init__(self, audio, sample_rate=16000, frame_ms=100):
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = int(sample_rate * frame_ms / 1000)
+        self._stream = None
+
+    def __iter__(self):
+        import pyaudio
+        self._stream = self.audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.frames_per_buffer
+        )
+        try:
+            while True:
+                yield self._stream.read(self.frames_per_buffer, exception_on_overflow=False)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+
+class WavFileSource:
+    """Frames read from a 16-bit mono WAV file, optionally paced in real time
+
+    The file must already be at `sample_rate`: it is sent as is, and audio
+    labelled with the wrong rate is not recognized.
+    """
+
+    def __init__(self, path, frame_ms=100, realtime=False, sample_rate=16000):
+        self.path = path
+        self.frame_ms = frame_ms
+        self.realtime = realtime
+        with wave.open(path, 'rb') as wav_file:
+            if wav_file.getsampwidth() != 2 or wav_file.getnchannels() != 1:
+                raise ValueError(f"{path}: expected 16-bit mono audio")
+            if wav_file.getframerate() != sample_rate:
+                raise ValueError(f"{path}: expected {sample_rate} Hz audio, got "
+                                 f"{wav_file.getframerate()} Hz; resample it first")
+            self.sample_rate = sample_rate
+
+    def __iter__(self):
+        frames_per_buffer = int(self.sample_rate * self.frame_ms / 1000)
+        with wave.open(self.path, 'rb') as wav_file:
+            next_at = time.monotonic()
+            while True:
+                frame = wav_file.readframes(frames_per_buffer)
+                if not frame:
+                    return
+                if self.realtime:
+                    next_at += self.frame_ms / 1000
+                    time.sleep(max(0.0, next_at - time.monotonic()))
+                yield frame
+
+def frame_rms(frame):
+    """Root-mean-square level of a LINEAR16 frame"""
+    samples = array.array('h')
+    samples.frombytes(frame[:len(frame) - len(frame) % 2])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+class EnergyVAD:
+    """Energy-based end-of-speech detector
+
+    A frame counts as speech when its RMS exceeds both `threshold` and
+    `ratio` times the running noise floor. The utterance ends after
+    `hangover_ms` of silence following speech, after `no_speech_ms` without
+    any speech, or after `max_ms` in total.
+    """
+
+    def __init__(self, threshold=400, ratio=3.0, hangover_ms=700, no_speech_ms=5000,
+                 max_ms=15000, sample_rate=16000):
+        self.threshold = threshold
+        self.ratio = ratio
+        self.hangover_ms = hangover_ms
+        self.no_speech_ms = no_speech_ms
+        self.max_ms = max_ms
+        self.sample_rate = sample_rate
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = None
+        self.heard_speech = False
+        self.elapsed_ms = 0.0
+        self.silence_ms = 0.0
+
+    def is_speech(self, rms):
+        if self.noise_floor is None:
+            # Don't let a user who starts talking immediately set the floor
+            self.noise_floor = min(rms, self.threshold / self.ratio)
+        speech = rms > self.threshold and rms > self.noise_floor * self.ratio
+        if not speech:
+            # Track the background level slowly so a noisy room raises the bar
+            self.noise_floor = 0.9 * self.noise_floor + 0.1 * rms
+        return speech
+
+    def update(self, frame):
+        """Feed one frame; returns True when the utterance is over"""
+        frame_ms = len(frame) / 2 / self.sample_rate * 1000
+        self.elapsed_ms += frame_ms
+
+        if self.is_speech(frame_rms(frame)):
+            self.heard_speech = True
+            self.silence_ms = 0.0
+        else:
+            self.silence_ms += frame_ms
+
+        if self.elapsed_ms >= self.max_ms:
+            return True
+        if self.heard_speech:
+            return self.silence_ms >= self.hangover_ms
+        return self.elapsed_ms >= self.no_speech_ms
@@ -0,0 +1,203 @@
+# audio_output.py
+"""Output sinks for response audio
+
+A sink takes LINEAR16 chunks while the response streams in:
+
+    sink.start(); sink.feed(chunk) ...; stats = sink.finish()   # or sink.stop() to abort
+
+StreamingPlayer plays them on a PyAudio device, WavFileSink writes them to a
+WAV file and NullSink only counts them, for headless servers and benchmarks.
+"""
+import collections
+import threading
+import time
+import wave
+
+class PlaybackStats:
+    """Timing and buffer health of one streamed playback"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_audio_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self.bytes = 0
+        # Number of times the jitter buffer ran dry after playback had started
+        self.underruns = 0
+        self.underrun_seconds = 0.0
+
+    @property
+    def time_to_first_audio(self):
+        if self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.started_at
+
+    def summary(self):
+        if self.first_audio_at is None:
+            return "no audio played"
+        return (f"first audio after {self.time_to_first_audio * 1000:.0f} ms, "
+                f"{self.chunks} chunks, {self.underruns} underruns "
+                f"({self.underrun_seconds * 1000:.0f} ms starved)")
+
+class StreamingPlayer:
+    """Plays audio chunks while the response is still arriving
+
+    Chunks are queued by `feed()` and written to a PyAudio output stream on a
+    background thread. Playback starts once `prebuffer_ms` of audio is queued
+    (or the response ends), and rebuffers the same amount after an underrun.
+    """
+
+    def __init__(self, audio, rate=16000, channels=1, sample_width=2, prebuffer_ms=120):
+        self.audio = audio
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.prebuffer_bytes = int(rate * channels * sample_width * prebuffer_ms / 1000)
+        self.stats = PlaybackStats()
+        self._chunks = collections.deque()
+        self._buffered = 0
+        self._finished = False
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """Start the playback thread"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def feed(self, chunk):
+        """Queue a chunk of audio for playback"""
+        with self._cond:
+            self._chunks.append(chunk)
+            self._buffered += len(chunk)
+            self._cond.notify()
+
+    def finish(self):
+        """Signal the end of the response and wait for playback to drain"""
+        with self._cond:
+            self._finished = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stats
+
+    def stop(self):
+        """Abort playback, dropping anything still buffered"""
+        with self._cond:
+            self._stopped = True
+            self._chunks.clear()
+            self._buffered = 0
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.stats
+
+    def _ready(self):
+        return self._finished or self._stopped or self._buffered >= self.prebuffer_bytes
+
+    def _run(self):
+        stream = None
+        try:
+            with self._cond:
+                self._cond.wait_for(self._ready)
+
+            stream = self.audio.open(
+                format=self.audio.get_format_from_width(self.sample_width),
+                channels=self.channels,
+                rate=self.rate,
+                output=True
+            )
+
+            while True:
+                with self._cond:
+                    if self._stopped:
+                        break
+                    if not self._chunks:
+                        if self._finished:
+                            break
+                        # Buffer ran dry mid-response: count it and rebuffer
+                        self.stats.underruns += 1
+                        starved_at = time.perf_counter()
+                        self._cond.wait_for(self._ready)
+                        self.stats.underrun_seconds += time.perf_counter() - starved_at
+                        continue
+                    chunk = self._chunks.popleft()
+                    self._buffered -= len(chunk)
+
+                if self.stats.first_audio_at is None:
+                    self.stats.first_audio_at = time.perf_counter()
+                stream.write(chunk)
+                self.stats.chunks += 1
+                self.stats.bytes += len(chunk)
+
+        except Exception as e:
+            print(f"Error playing audio: {e}")
+
+        finally:
+            if stream is not None:
+                stream.stop_stream()
+                stream.close()
+            self.stats.finished_at = time.perf_counter()
+
+class WavFileSink:
+    """Writes chunks to a WAV file as they arrive
+
+    Frames go straight to disk and the header is patched with the final
+    length on close, so memory stays flat however long the answer is.
+    """
+
+    def __init__(self, path, rate=16000, channels=1, sample_width=2):
+        self.path = path
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.stats = PlaybackStats()
+        self._wav_file = None
+
+    def start(self):
+        self._wav_file = wave.open(self.path, 'wb')
+        self._wav_file.setnchannels(self.channels)
+        self._wav_file.setsampwidth(self.sample_width)
+        self._wav_file.setframerate(self.rate)
+        return self
+
+    def feed(self, chunk):
+        if self.stats.first_audio_at is None:
+            self.stats.first_audio_at = time.perf_counter()
+        self._wav_file.writeframesraw(chunk)
+        self.stats.chunks += 1
+        self.stats.bytes += len(chunk)
+
+    def finish(self):
+        if self._wav_file is not None:
+            self._wav_file.close()
+            self._wav_file = None
+        self.stats.finished_at = time.perf_counter()
+        return self.stats
+
+    # An aborted answer still leaves a valid (shorter) file
+    stop = finish
+
+class NullSink:
+    """Discards audio, keeping only the stats"""
+
+    def __init__(self, rate=16000):
+        self.rate = rate
+        self.stats = PlaybackStats()
+
+    def start(self):
+        return self
+
+    def feed(self, chunk):
+        if self.stats.first_audio_at is None:
+            self.stats.first_audio_at = time.perf_counter()
+        self.stats.chunks += 1
+        self.stats.bytes += len(chunk)
+
+    def finish(self):
+        self.stats.finished_at = time.perf_counter()
+        return self.stats
+
+    stop = finish
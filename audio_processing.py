@@ -0,0 +1,156 @@
+# audio_processing.py
+"""Chunk-by-chunk post-processing of Assistant audio before playback
+
+Trims leading and trailing silence, evens out loudness between answers and
+resamples to the output device's native rate so the OS mixer does not have
+to. Every step carries its state from one chunk to the next, so a response
+is never held in memory as a whole. Needs numpy.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class AudioPostProcessor:
+    """Streaming silence trim, gain normalization and resampling for LINEAR16 mono
+
+    Feed chunks to `process()` and play what it returns (possibly b''), then
+    play whatever `flush()` returns once the response has ended. Use one
+    instance per response.
+
+    Samples above `silence_threshold` count as sound. Up to `pad_ms` of
+    silence is kept around the sound so word onsets and decays aren't cut.
+    Trailing silence is held back until more sound arrives or the response
+    ends; at most `max_hold_ms` of it is held, anything older is released.
+
+    Gain is chosen so the loudest sample so far lands on `target_peak_dbfs`,
+    capped at `max_gain`. It only ever moves down during a response. When a
+    louder chunk arrives it ramps down to the new gain by that chunk's first
+    too-loud sample, so normalized audio never exceeds the target peak.
+    """
+
+    def __init__(self, sample_rate=16000, output_rate=None, trim_silence=True, normalize=True,
+                 silence_threshold=300, pad_ms=30, max_hold_ms=2000,
+                 target_peak_dbfs=-1.0, max_gain=4.0):
+        if np is None:
+            raise RuntimeError("Audio post-processing needs numpy; install it with 'pip install numpy'")
+        self.sample_rate = sample_rate
+        self.output_rate = int(output_rate or sample_rate)
+        self.trim_silence = trim_silence
+        self.normalize = normalize
+        self.silence_threshold = silence_threshold
+        self.pad_samples = int(sample_rate * pad_ms / 1000)
+        self.max_hold_samples = int(sample_rate * max_hold_ms / 1000)
+        self.target_peak = 32767 * 10 ** (target_peak_dbfs / 20)
+        self.max_gain = max_gain
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # Samples dropped by the silence trim, at the input rate
+        self.trimmed_samples = 0
+
+        self._odd_byte = b''
+        self._started = False
+        self._held = np.zeros(0, dtype=np.float32)
+        self._gain = None
+        self._peak = 0.0
+        # Resampler state: last input sample and the read position relative to it
+        self._step = sample_rate / self.output_rate
+        self._last = np.zeros(0, dtype=np.float32)
+        self._position = 0.0
+
+    def process(self, chunk):
+        """Process one LINEAR16 chunk; returns the PCM ready to play"""
+        self.bytes_in += len(chunk)
+        data = self._odd_byte + bytes(chunk)
+        usable = len(data) - len(data) % 2
+        self._odd_byte = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32)
+        if self.trim_silence:
+            samples = self._trim(samples)
+        return self._output(samples)
+
+    def flush(self):
+        """End of response: drop trailing silence beyond the pad; returns the last PCM"""
+        held, self._held = self._held, self._held[:0]
+        if not self.trim_silence:
+            return self._output(held)
+        if not self._started:
+            # Nothing but silence
+            self.trimmed_samples += len(held)
+            return b''
+        self.trimmed_samples += max(0, len(held) - self.pad_samples)
+        return self._output(held[:self.pad_samples])
+
+    @property
+    def trimmed_ms(self):
+        return self.trimmed_samples * 1000 / self.sample_rate
+
+    def _trim(self, samples):
+        loud = np.flatnonzero(np.abs(samples) > self.silence_threshold)
+        samples = np.concatenate((self._held, samples))
+        offset = len(self._held)
+
+        if not len(loud):
+            # All silence: hold it, keeping only the pad before the first sound
+            if not self._started:
+                self.trimmed_samples += max(0, len(samples) - self.pad_samples)
+                self._held = samples[-self.pad_samples:] if self.pad_samples else samples[:0]
+                return samples[:0]
+            release = max(0, len(samples) - self.max_hold_samples)
+            self._held = samples[release:]
+            return samples[:release]
+
+        first, last = offset + loud[0], offset + loud[-1] + 1
+        if not self._started:
+            self._started = True
+            start = max(0, first - self.pad_samples)
+            self.trimmed_samples += start
+            samples, last = samples[start:], last - start
+        release = max(last, len(samples) - self.max_hold_samples)
+        self._held = samples[release:]
+        return samples[:release]
+
+    def _apply_gain(self, samples):
+        self._peak = max(self._peak, float(np.abs(samples).max()))
+        if self._peak == 0.0:
+            return samples
+        gain = min(self.max_gain, self.target_peak / self._peak)
+        if self._gain is None:
+            self._gain = gain
+        if gain < self._gain:
+            # Ramp down so the new gain is reached by the first sample that would
+            # exceed the target at the old gain; the rest of the chunk uses it
+            over = np.flatnonzero(np.abs(samples) * self._gain > self.target_peak)
+            reach = int(over[0]) if len(over) else len(samples) - 1
+            envelope = np.full(len(samples), gain, dtype=np.float32)
+            envelope[:reach + 1] = np.linspace(self._gain, gain, reach + 2, dtype=np.float32)[1:]
+            self._gain = gain
+            return samples * envelope
+        return samples * self._gain
+
+    def _resample(self, samples):
+        # Linear interpolation, continuing from the last sample of the previous chunk
+        samples = np.concatenate((self._last, samples))
+        end = len(samples) - 1
+        if end <= self._position:
+            self._last = samples[-1:]
+            self._position -= end
+            return samples[:0]
+        count = int(np.ceil((end - self._position) / self._step))
+        positions = self._position + self._step * np.arange(count)
+        resampled = np.interp(positions, np.arange(len(samples)), samples)
+        self._position += self._step * count - end
+        self._last = samples[-1:]
+        return resampled
+
+    def _output(self, samples):
+        if not len(samples):
+            return b''
+        if self.normalize:
+            samples = self._apply_gain(samples)
+        if self.output_rate != self.sample_rate:
+            samples = self._resample(samples)
+        pcm = np.clip(np.rint(samples), -32768, 32767).astype('<i2').tobytes()
+        self.bytes_out += len(pcm)
+        return pcm
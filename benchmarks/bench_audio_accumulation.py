@@ -0,0 +1,67 @@
+# benchmarks/bench_audio_accumulation.py
+"""Micro-benchmark: cost per chunk of accumulating response audio
+
+Compares the old `audio_data += chunk` loop with the chunk list used by
+send_command (plus a bytearray for reference) for growing response lengths.
+A linear strategy keeps the cost per chunk flat as the response grows.
+
+    python benchmarks/bench_audio_accumulation.py [--chunk-size 1600]
+"""
+import argparse
+import time
+
+def concat_bytes(chunks):
+    audio_data = b''
+    for chunk in chunks:
+        audio_data += chunk
+    return memoryview(audio_data)
+
+def join_list(chunks):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+    return memoryview(b''.join(parts))
+
+def extend_bytearray(chunks):
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+    return memoryview(buffer)
+
+STRATEGIES = {
+    'bytes +=': concat_bytes,
+    'list + join': join_list,
+    'bytearray': extend_bytearray,
+}
+
+def measure(strategy, chunks, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        strategy(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk-size', type=int, default=1600,
+                        help='bytes per AssistResponse audio chunk (default: 50 ms of LINEAR16)')
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 4000, 16000],
+                        help='number of chunks per simulated response')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'audio':>10} " + ' '.join(f'{name:>14}' for name in STRATEGIES))
+    for count in args.counts:
+        # Distinct objects, as the gRPC stream would deliver them
+        chunks = [bytes([i % 256]) * args.chunk_size for i in range(count)]
+        row = []
+        for strategy in STRATEGIES.values():
+            seconds = measure(strategy, chunks, args.repeat)
+            row.append(f'{seconds / count * 1e9:>11.0f} ns')
+        seconds_of_audio = count * args.chunk_size / 32000
+        print(f'{count:>8} {seconds_of_audio:>9.0f}s ' + ' '.join(f'{cell:>14}' for cell in row))
+    print("\nValues are the cost per chunk; flat columns mean linear total cost.")
+
+if __name__ == '__main__':
+    main()
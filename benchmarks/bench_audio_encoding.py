@@ -0,0 +1,86 @@
+# benchmarks/bench_audio_encoding.py
+"""Benchmark: bytes on the wire vs. decode cost per audio-out encoding
+
+Compresses a speech-like test signal to each encoding the Assistant offers,
+then decodes it back through audio_decoder.StreamingDecoder in stream-sized
+chunks. Reports size, bitrate, transfer time over a constrained link and
+decoder CPU per second of audio. Needs ffmpeg (or FFMPEG_BINARY).
+
+    python benchmarks/bench_audio_encoding.py --seconds 10 --link-kbps 256
+"""
+import argparse
+import array
+import math
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_decoder import StreamingDecoder, find_ffmpeg
+from mock_server import encode_audio
+
+def speech_like(seconds, sample_rate=16000, seed=1):
+    """Harmonic voice-band signal with syllable-rate envelope and a little noise"""
+    rng = random.Random(seed)
+    samples = array.array('h')
+    for n in range(int(seconds * sample_rate)):
+        t = n / sample_rate
+        pitch = 140 + 30 * math.sin(2 * math.pi * 0.7 * t)
+        envelope = max(0.0, math.sin(2 * math.pi * 3.5 * t)) ** 0.5
+        voice = sum(math.sin(2 * math.pi * pitch * k * t) / k for k in range(1, 8))
+        samples.append(int(max(-32767, min(32767, 6000 * envelope * voice + rng.gauss(0, 150)))))
+    return samples.tobytes()
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def decode(encoded, encoding, chunk_size):
+    pcm_bytes = 0
+
+    def on_pcm(block):
+        nonlocal pcm_bytes
+        pcm_bytes += len(block)
+
+    cpu_before = children_cpu()
+    started = time.perf_counter()
+    decoder = StreamingDecoder(encoding, on_pcm).start()
+    for offset in range(0, len(encoded), chunk_size):
+        decoder.feed(encoded[offset:offset + chunk_size])
+    decoder.finish()
+    return time.perf_counter() - started, children_cpu() - cpu_before, pcm_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10.0, help="length of the test answer")
+    parser.add_argument('--bitrates', nargs='+', default=['24k', '32k', '64k'])
+    parser.add_argument('--chunk-size', type=int, default=1024,
+                        help="compressed bytes per simulated AssistResponse")
+    parser.add_argument('--link-kbps', type=float, default=256.0,
+                        help="link speed used for the transfer-time column")
+    args = parser.parse_args()
+
+    if not find_ffmpeg():
+        sys.exit("ffmpeg not found; install it or set FFMPEG_BINARY")
+
+    pcm = speech_like(args.seconds)
+    rows = [('linear16', '-', len(pcm), 0.0, 0.0)]
+    for name, encoding in (('mp3', 2), ('opus', 3)):
+        for bitrate in args.bitrates:
+            encoded = encode_audio(pcm, encoding, bitrate=bitrate)
+            wall, cpu, pcm_out = decode(encoded, encoding, args.chunk_size)
+            rows.append((name, bitrate, len(encoded), wall, cpu))
+
+    print(f"{args.seconds:.0f} s of audio, {args.link_kbps:.0f} kbps link\n")
+    print(f"{'encoding':>9} {'bitrate':>8} {'bytes':>9} {'ratio':>6} {'wire s':>7} "
+          f"{'decode wall ms':>15} {'decode cpu ms/s':>16}")
+    for name, bitrate, size, wall, cpu in rows:
+        wire_seconds = size * 8 / (args.link_kbps * 1000)
+        print(f"{name:>9} {bitrate:>8} {size:>9} {len(pcm) / size:>6.1f} {wire_seconds:>7.2f} "
+              f"{wall * 1000:>15.1f} {cpu * 1000 / args.seconds:>16.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_protobuf_backend.py
+"""Benchmark: AssistResponse parse throughput per protobuf backend
+
+Each backend runs in its own interpreter (the backend is fixed at import
+time). Responses carry audio_out payloads like a real Assist stream.
+
+    python benchmarks/bench_protobuf_backend.py [--backends upb cpp python]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def worker(chunk_size, messages, repeat):
+    sys.path.insert(0, ROOT)
+    from assistant_protos import describe_backend, embedded_assistant_pb2, protobuf_backend
+
+    response = embedded_assistant_pb2.AssistResponse()
+    response.audio_out.audio_data = os.urandom(chunk_size)
+    response.dialog_state_out.supplemental_display_text = 'Here is what I found'
+    payload = response.SerializeToString()
+    parse = embedded_assistant_pb2.AssistResponse.FromString
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(messages):
+            parse(payload).audio_out.audio_data
+        best = min(best, time.perf_counter() - start)
+
+    print(json.dumps({
+        'backend': protobuf_backend(),
+        'description': describe_backend(),
+        'chunk_size': chunk_size,
+        'messages_per_s': messages / best,
+        'mb_per_s': messages * len(payload) / best / 1e6,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['upb', 'cpp', 'python'])
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[1600, 9600, 32000])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        for chunk_size in args.chunk_sizes:
+            worker(chunk_size, args.messages, args.repeat)
+        return
+
+    print(f"{'requested':>10} {'active':>8} {'chunk':>7} {'msgs/s':>12} {'MB/s':>9}")
+    for backend in args.backends:
+        env = dict(os.environ, PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=backend)
+        command = [sys.executable, __file__, '--worker',
+                   '--messages', str(args.messages), '--repeat', str(args.repeat),
+                   '--chunk-sizes', *map(str, args.chunk_sizes)]
+        proc = subprocess.run(command, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            reason = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'
+            print(f"{backend:>10} unavailable: {reason}")
+            continue
+        for line in proc.stdout.splitlines():
+            if not line.startswith('{'):
+                continue
+            row = json.loads(line)
+            print(f"{backend:>10} {row['backend']:>8} {row['chunk_size']:>7} "
+                  f"{row['messages_per_s']:>12.0f} {row['mb_per_s']:>9.1f}")
+
+if __name__ == '__main__':
+    main()
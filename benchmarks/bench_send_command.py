@@ -0,0 +1,164 @@
+# benchmarks/bench_send_command.py
+"""End-to-end benchmark of GoogleAssistantClient.send_command
+
+Runs send_command (playback disabled) against the in-process mock Assist
+server at several concurrency levels and reports latency and
+time-to-first-chunk percentiles, commands per second and peak RSS. Results
+are written as JSON; pass --compare to check them against an earlier run.
+
+    python benchmarks/bench_send_command.py --output bench.json
+    python benchmarks/bench_send_command.py --compare bench.json
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assistant_client import GoogleAssistantClient, StaticCredentialManager
+from assistant_protos import describe_backend
+from mock_server import MockAssistantServicer, create_server
+
+# Metrics checked by --compare, and whether a larger value is better
+COMPARED_METRICS = {
+    'latency_p95_ms': False,
+    'ttfc_p95_ms': False,
+    'commands_per_s': True,
+}
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def run_level(assistant, concurrency, requests):
+    def one(index):
+        started = time.perf_counter()
+        ok = assistant.send_command(f'benchmark query {index}', play=False)
+        latency = time.perf_counter() - started
+        result = assistant.last_result
+        ttfc = None
+        if result is not None and result.first_chunk_at is not None:
+            ttfc = result.first_chunk_at - result.started_at
+        return ok, latency, ttfc
+
+    rss_before = peak_rss_kb()
+    started = time.perf_counter()
+    # send_command narrates every call; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    rss_after = peak_rss_kb()
+
+    latencies = [latency * 1000 for ok, latency, _ in outcomes if ok]
+    ttfcs = [ttfc * 1000 for ok, _, ttfc in outcomes if ok and ttfc is not None]
+    row = {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for ok, _, _ in outcomes if not ok),
+        'commands_per_s': round(len(latencies) / elapsed, 1),
+        'peak_rss_kb': rss_after,
+        'rss_growth_per_request_kb': round((rss_after - rss_before) / requests, 2),
+    }
+    for name, values in (('latency', latencies), ('ttfc', ttfcs)):
+        for pct in (50, 95, 99):
+            row[f'{name}_p{pct}_ms'] = round(percentile(values, pct), 2) if values else None
+    return row
+
+def compare(current, baseline, tolerance):
+    """Print per-level deltas; return the number of regressions beyond tolerance"""
+    previous = {row['concurrency']: row for row in baseline['levels']}
+    regressions = 0
+    for row in current['levels']:
+        old = previous.get(row['concurrency'])
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not old.get(metric) or row.get(metric) is None:
+                continue
+            change = (row[metric] - old[metric]) / old[metric]
+            worse = -change if higher_is_better else change
+            flag = 'REGRESSION' if worse > tolerance else ''
+            regressions += bool(flag)
+            print(f"  c={row['concurrency']:<4} {metric:<16} {old[metric]:>10} -> {row[metric]:>10} "
+                  f"({change:+.1%}) {flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=200, help="commands per concurrency level")
+    parser.add_argument('--chunk-size', type=int, default=3200)
+    parser.add_argument('--chunk-count', type=int, default=25)
+    parser.add_argument('--chunk-delay', type=float, default=0.0)
+    parser.add_argument('--first-byte-delay', type=float, default=0.0)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', metavar='BASELINE', help="earlier --output file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed relative regression before --compare fails (default: 0.10)")
+    args = parser.parse_args()
+
+    servicer = MockAssistantServicer(
+        chunk_size=args.chunk_size,
+        chunk_count=args.chunk_count,
+        chunk_delay=args.chunk_delay,
+        first_byte_delay=args.first_byte_delay
+    )
+    server, port = create_server(servicer, max_workers=max(args.concurrency) + 4)
+    assistant = GoogleAssistantClient(
+        api_endpoint=f'localhost:{port}',
+        insecure=True,
+        credential_manager=StaticCredentialManager(),
+        device_config={'device_id': 'bench-device', 'device_model_id': 'bench-model'}
+    )
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'protobuf': describe_backend(),
+        'config': vars(args),
+        'levels': [],
+    }
+    try:
+        # Warm the channel so the first level doesn't pay for connection setup
+        with contextlib.redirect_stdout(io.StringIO()):
+            assistant.send_command('warm up', play=False)
+
+        print(f"{'conc':>5} {'cmd/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+              f"{'ttfc50':>8} {'ttfc95':>8} {'errors':>6} {'rss MB':>7}")
+        for concurrency in args.concurrency:
+            row = run_level(assistant, concurrency, args.requests)
+            report['levels'].append(row)
+            print(f"{concurrency:>5} {row['commands_per_s']:>8} {row['latency_p50_ms']:>8} "
+                  f"{row['latency_p95_ms']:>8} {row['latency_p99_ms']:>8} {row['ttfc_p50_ms']:>8} "
+                  f"{row['ttfc_p95_ms']:>8} {row['errors']:>6} {row['peak_rss_kb'] / 1024:>7.1f}")
+    finally:
+        assistant.cleanup()
+        server.stop(grace=None)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} ({baseline.get('timestamp')}):")
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
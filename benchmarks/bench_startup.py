@@ -0,0 +1,175 @@
+# benchmarks/bench_startup.py
+"""Startup-time report for the GUI, with a regression check
+
+Imports app.py in fresh interpreters under `python -X importtime` and
+reports the median self and cumulative import time of every module it pulls
+in, then times AssistantGUI() construction and the first setup check. Fails
+(exit status 1) when the import of app exceeds --budget-ms, when the first
+setup check (which runs before the first frame) exceeds --setup-budget-ms,
+or when any of the --forbid modules, which should stay lazy, is imported
+at startup.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --budget-ms 150 --top 25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that app.py defers until they are needed
+DEFAULT_FORBIDDEN = [
+    'grpc',
+    'pyaudio',
+    'google.auth',
+    'google_auth_oauthlib',
+    'google.protobuf',
+    'numpy',
+    'assistant_client',
+    'register_device',
+    'generate_protos',
+]
+
+# Run in a child process: times GUI construction and the first status check
+INIT_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+before = set(sys.modules)
+gui = {module}.AssistantGUI()
+constructed = time.perf_counter()
+constructed_modules = set(sys.modules) - before
+gui.update_setup_status()
+checked = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'construct_ms': (constructed - imported) * 1000,
+    'setup_check_ms': (checked - constructed) * 1000,
+    'construct_modules': sorted(constructed_modules),
+    'setup_check_modules': sorted(set(sys.modules) - before - constructed_modules),
+}}))
+'''
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us, top-level module that imported it)}
+
+    -X importtime prints a module after everything it imported, indented
+    two spaces per level, so children are collected until their top-level
+    parent's line appears.
+    """
+    modules = {}
+    pending = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        name = name.strip()
+        modules[name] = [int(self_us), int(cumulative_us), None]
+        if depth == 1:
+            pending.append(name)
+        elif depth == 0:
+            for child in pending:
+                modules[child][2] = name
+            pending = []
+    return modules
+
+def measure_imports(module, runs):
+    """Median (self_ms, cumulative_ms, parent) per module over several fresh interpreters"""
+    samples = {}
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=REPO, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            sys.exit(f"import {module} failed:\n{completed.stderr.splitlines()[-1]}")
+        for name, values in parse_importtime(completed.stderr).items():
+            samples.setdefault(name, []).append(values)
+    return {
+        name: (
+            statistics.median(v[0] for v in values) / 1000,
+            statistics.median(v[1] for v in values) / 1000,
+            values[0][2],
+        )
+        for name, values in samples.items()
+    }
+
+def measure_init(module):
+    completed = subprocess.run(
+        [sys.executable, '-c', INIT_SCRIPT.format(module=module)],
+        cwd=REPO, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        print(f"Skipping init timing: {completed.stderr.strip().splitlines()[-1]}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app', help="module to import (default: app)")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters to take the median of")
+    parser.add_argument('--top', type=int, default=15, help="slowest modules to list")
+    parser.add_argument('--budget-ms', type=float, default=250.0,
+                        help="fail if importing --module takes longer than this")
+    parser.add_argument('--setup-budget-ms', type=float, default=50.0,
+                        help="fail if the first setup check, which blocks the first frame, "
+                             "takes longer than this")
+    parser.add_argument('--forbid', nargs='*',
+                        help="fail if any of these (or their submodules) is imported at startup "
+                             "(default for app: grpc, pyaudio, google-auth, protobuf, numpy, ...)")
+    parser.add_argument('--no-init', action='store_true',
+                        help="skip timing AssistantGUI() and the first setup check")
+    args = parser.parse_args()
+    if args.forbid is None:
+        args.forbid = DEFAULT_FORBIDDEN if args.module == 'app' else []
+
+    modules = measure_imports(args.module, args.runs)
+    total_ms = modules[args.module][1]
+
+    print(f"import {args.module}: {total_ms:.1f} ms (median of {args.runs}), {len(modules)} modules\n")
+    print(f"{'self ms':>8} {'cumul ms':>9}  module")
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    for name, (self_ms, cumulative_ms, parent) in slowest:
+        print(f"{self_ms:>8.1f} {cumulative_ms:>9.1f}  {name}")
+
+    print(f"\nDirect imports of {args.module}:")
+    for name, (self_ms, cumulative_ms, parent) in modules.items():
+        if parent == args.module:
+            print(f"{cumulative_ms:>9.1f} ms  {name}")
+
+    init = None
+    if not args.no_init and args.module == 'app':
+        init = measure_init(args.module)
+        if init is not None:
+            print(f"\nAssistantGUI(): {init['construct_ms']:.1f} ms, "
+                  f"{len(init['construct_modules'])} modules imported")
+            print(f"First setup check: {init['setup_check_ms']:.1f} ms, "
+                  f"{len(init['setup_check_modules'])} modules imported")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import {args.module} took {total_ms:.1f} ms, budget is {args.budget_ms:.0f} ms")
+    if init is not None and init['setup_check_ms'] > args.setup_budget_ms:
+        failures.append(f"first setup check took {init['setup_check_ms']:.1f} ms, "
+                        f"budget is {args.setup_budget_ms:.0f} ms")
+    for name in args.forbid:
+        loaded = [module for module in modules if module == name or module.startswith(name + '.')]
+        if loaded:
+            failures.append(f"{name} is imported at startup (should be lazy)")
+
+    if failures:
+        print("\nStartup regression:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print(f"\nWithin budget ({args.budget_ms:.0f} ms import"
+          f"{'' if init is None else f', {args.setup_budget_ms:.0f} ms setup check'}), no forbidden imports")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+# device_shards.py
+"""Spread commands across several registered devices
+
+Assistant quotas are counted per device and per project. Registering more
+devices and sending each command through one of them scales throughput
+with the number of devices. Each device (a shard) has its own
+device_config and token, so its own credentials and channels. Only the
+network side is sharded: playback, decoding and the response cache stay
+in one client.
+
+A profiles file lists the devices; relative paths are resolved against
+the file's directory:
+
+    [
+      {"name": "kitchen", "device_config": "kitchen/device_config.json",
+       "token": "kitchen/token.json"},
+      {"name": "office", "device_config": {"device_id": "...", "device_model_id": "..."},
+       "token": "office/token.json", "credentials": "office/credentials.json"}
+    ]
+
+A shard that returns RESOURCE_EXHAUSTED, or fails authentication, rests
+for quota_cooldown seconds, and the command moves to another shard if no
+audio had been sent yet. After max_failures consecutive other failures a
+shard rests for failure_cooldown seconds.
+"""
+import json
+import os
+import threading
+import time
+
+import grpc
+from assistant_client import (
+    CredentialManager,
+    GoogleAssistantClient,
+    StaticCredentialManager,
+    load_device_config
+)
+
+STRATEGIES = ('round_robin', 'least_loaded')
+
+# Failures that belong to the device or its project rather than the network
+QUOTA_CODES = frozenset([grpc.StatusCode.RESOURCE_EXHAUSTED])
+AUTH_CODES = frozenset([grpc.StatusCode.UNAUTHENTICATED, grpc.StatusCode.PERMISSION_DENIED])
+
+# Client options that shard clients share with the sharded client
+SHARD_OPTIONS = ('channel_pool_size', 'api_endpoint', 'insecure', 'root_certificates',
+                 'metrics', 'audio_encoding', 'retry_policy')
+
+class NoShardAvailable(Exception):
+    """Every shard is cooling down; retry_after is when the first one is back (seconds)"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"All devices are cooling down after errors; next one is back in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+def load_profiles(path):
+    """Read a profiles file; returns a list of dicts with paths made absolute"""
+    with open(path, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    if not profiles:
+        raise Exception(f"No device profiles in {path}")
+    base = os.path.dirname(os.path.abspath(path))
+    for index, profile in enumerate(profiles):
+        profile.setdefault('name', f'device-{index}')
+        for key in ('token', 'credentials'):
+            if key in profile:
+                profile[key] = os.path.join(base, profile[key])
+        if isinstance(profile.get('device_config'), str):
+            profile['device_config'] = os.path.join(base, profile['device_config'])
+    return profiles
+
+class Shard:
+    """One device: its client, load and health"""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.in_flight = 0
+        self.served = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.last_error = None
+
+    def available(self, now):
+        return now >= self.cooldown_until
+
+    def status(self, now):
+        return {
+            'name': self.name,
+            'device_id': self.client.device_id,
+            'state': 'ok' if self.available(now) else 'cooldown',
+            'cooldown_s': round(max(0.0, self.cooldown_until - now), 1),
+            'in_flight': self.in_flight,
+            'served': self.served,
+            'errors': self.errors,
+            'quota_errors': self.quota_errors,
+            'last_error': self.last_error,
+        }
+
+class ShardedAssistantClient(GoogleAssistantClient):
+    """GoogleAssistantClient that sends each text or voice command through one of several devices
+
+    `strategy` is 'least_loaded' (fewest commands in flight) or
+    'round_robin'. Other keyword options are the usual client options.
+    Connection options are passed to every shard, and playback options
+    stay with this client.
+    """
+
+    def __init__(self, profiles, strategy='least_loaded', quota_cooldown=60.0, failure_cooldown=10.0,
+                 max_failures=3, **options):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown shard strategy {strategy!r}; use one of {', '.join(STRATEGIES)}")
+        self.strategy = strategy
+        self.quota_cooldown = quota_cooldown
+        self.failure_cooldown = failure_cooldown
+        self.max_failures = max_failures
+
+        shard_options = {key: options[key] for key in SHARD_OPTIONS if key in options}
+        self.shards = []
+        for profile in profiles:
+            client = GoogleAssistantClient(
+                credential_manager=self._profile_credentials(profile, options.get('credential_manager')),
+                device_config=self._profile_device_config(profile),
+                output='null',
+                **shard_options
+            )
+            self.shards.append(Shard(profile['name'], client))
+
+        # This client only plays audio and caches; it is never used to open a call itself
+        options['credential_manager'] = self.shards[0].client.credential_manager
+        options['device_config'] = {
+            'device_id': self.shards[0].client.device_id,
+            'device_model_id': self.shards[0].client.device_model_id,
+        }
+        super().__init__(**options)
+        self._shard_lock = threading.Lock()
+        self._next_shard = 0
+
+    def _profile_credentials(self, profile, default):
+        if 'static_token' in profile:
+            return StaticCredentialManager(profile['static_token'])
+        if 'token' not in profile and default is not None:
+            # e.g. a --static-token shared by every shard of a local test server
+            return default
+        return CredentialManager(
+            profile.get('credentials', 'credentials.json'),
+            profile.get('token', 'token.json'),
+            ['https://www.googleapis.com/auth/assistant-sdk-prototype']
+        )
+
+    def _profile_device_config(self, profile):
+        config = profile.get('device_config', 'device_config.json')
+        if isinstance(config, dict):
+            return config
+        return load_device_config(config)
+
+    def _acquire(self, exclude=()):
+        """Pick a shard for one command and count it in flight, or None if every candidate rests"""
+        now = time.monotonic()
+        with self._shard_lock:
+            # Rotate the starting point so ties don't always land on the first shard
+            count = len(self.shards)
+            start = self._next_shard
+            ordered = [self.shards[(start + offset) % count] for offset in range(count)]
+            candidates = [shard for shard in ordered
+                          if shard.available(now) and shard.name not in exclude]
+            if not candidates:
+                return None
+            if self.strategy == 'least_loaded':
+                shard = min(candidates, key=lambda candidate: candidate.in_flight)
+            else:
+                shard = candidates[0]
+            self._next_shard = (self.shards.index(shard) + 1) % count
+            shard.in_flight += 1
+            return shard
+
+    def _release(self, shard, error=None, control=None):
+        """Record how a command went on shard; True if it should move to another shard"""
+        now = time.monotonic()
+        with self._shard_lock:
+            shard.in_flight -= 1
+            if error is None:
+                shard.served += 1
+                shard.consecutive_failures = 0
+                return False
+            if control is not None and control.cancelled:
+                return False
+            code = error.code() if isinstance(error, grpc.RpcError) else None
+            shard.errors += 1
+            shard.last_error = code.name if code is not None else str(error)
+            if code in QUOTA_CODES or code in AUTH_CODES:
+                if code in QUOTA_CODES:
+                    shard.quota_errors += 1
+                shard.cooldown_until = now + self.quota_cooldown
+                cooling = self.quota_cooldown
+                failover = True
+            else:
+                shard.consecutive_failures += 1
+                if shard.consecutive_failures < self.max_failures:
+                    return False
+                shard.consecutive_failures = 0
+                shard.cooldown_until = now + self.failure_cooldown
+                cooling = self.failure_cooldown
+                failover = False
+        print(f"Device {shard.name} failed ({shard.last_error}), resting it for {cooling:.0f}s")
+        if self.metrics is not None:
+            self.metrics.count('shard_cooldowns_total')
+            if code in QUOTA_CODES:
+                self.metrics.count('shard_quota_errors_total')
+        return failover
+
+    def _no_shard(self):
+        now = time.monotonic()
+        with self._shard_lock:
+            retry_after = min(shard.cooldown_until for shard in self.shards) - now
+        if self.metrics is not None:
+            self.metrics.count('shard_unavailable_total')
+        return NoShardAvailable(max(0.0, retry_after))
+
+    def _assist_text(self, command, on_audio, keep_audio, timeout, control):
+        """Run a text query on a shard, moving to the next one on quota or auth errors
+
+        A command only moves while none of its audio has been passed on;
+        after that the error is raised as usual.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        forwarded = []
+        forward = None
+        if on_audio is not None:
+            def forward(chunk):
+                forwarded.append(True)
+                on_audio(chunk)
+
+        tried = set()
+        while True:
+            shard = self._acquire(exclude=tried)
+            if shard is None:
+                raise self._no_shard()
+            tried.add(shard.name)
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                result = shard.client._assist_text(command, forward, keep_audio, remaining, control)
+            except Exception as e:
+                failover = self._release(shard, e, control)
+                if not failover or forwarded or len(tried) == len(self.shards):
+                    raise
+                if self.metrics is not None:
+                    self.metrics.count('shard_failovers_total')
+                continue
+            self._release(shard)
+            return result
+
+    def query_voice(self, source, vad=None, on_audio=None, keep_audio=True, timeout=None, control=None):
+        """query_voice on one shard; spoken audio cannot be replayed, so there is no failover"""
+        timeout = self._admit(timeout, control)
+        shard = self._acquire()
+        if shard is None:
+            raise self._no_shard()
+        try:
+            result = shard.client.query_voice(source, vad=vad, on_audio=on_audio, keep_audio=keep_audio,
+                                              timeout=timeout, control=control)
+        except Exception as e:
+            self._release(shard, e, control)
+            if isinstance(e, grpc.RpcError):
+                self._limiter_feedback(e)
+            raise
+        self._release(shard)
+        self._limiter_feedback()
+        return result
+
+    def shard_health(self):
+        """Status dict per shard: state, cooldown left, load and error counts"""
+        now = time.monotonic()
+        with self._shard_lock:
+            return [shard.status(now) for shard in self.shards]
+
+    def _prewarm_steps(self, timeout):
+        steps = []
+        for shard in self.shards:
+            for name, warm in shard.client._prewarm_steps(timeout):
+                steps.append((f'{shard.name} {name}', warm))
+        if self.output == 'speaker':
+            steps.append(('audio', self._warm_audio))
+        return steps
+
+    def cleanup(self):
+        for shard in self.shards:
+            shard.client.cleanup()
+        super().cleanup()
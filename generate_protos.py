@@ -1,11 +1,16 @@
 # generate_protos.py
+import hashlib
 import os
-import subprocess
-import sys
+import shutil
 from pathlib import Path
+from requirements_check import ensure_requirements, installed_version
 
-def install_requirements():
-    """Install required packages"""
+# Generated modules are kept here per (proto source, grpcio-tools version)
+PROTO_CACHE_DIR = '.proto_cache'
+GENERATED_FILES = ('embedded_assistant_pb2.py', 'embedded_assistant_pb2_grpc.py')
+
+def install_requirements(upgrade=None):
+    """Install required packages that are missing (all of them with upgrade)"""
     packages = [
         'grpcio-tools',
         'google-assistant-grpc',
@@ -14,14 +19,11 @@ def install_requirements():
         'google-assistant-sdk[samples]',
         'protobuf'
     ]
+    if upgrade is None:
+        upgrade = bool(os.environ.get('ASSISTANT_SETUP_UPGRADE'))
     
-    print("Installing/upgrading required packages...")
-    for package in packages:
-        try:
-            print(f"Installing {package}...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", package])
-        except subprocess.CalledProcessError as e:
-            print(f"Warning: Failed to install {package}: {e}")
+    print("Checking required packages...")
+    ensure_requirements(packages, upgrade=upgrade)
 
 def check_installations():
     """Check installed packages"""
@@ -44,9 +46,7 @@ def check_installations():
     
     return True
 
-def generate_proto_file():
-    """Generate the proto file"""
-    proto_content = '''syntax = "proto3";
+PROTO_CONTENT = '''syntax = "proto3";
 
 package google.assistant.embedded.v1alpha2;
 
@@ -116,12 +116,42 @@ message DeviceConfig {
     string device_model_id = 2;
 }'''
 
+def proto_cache_key():
+    """Hash of the proto source and the grpcio-tools version that compiles it"""
+    digest = hashlib.sha256(PROTO_CONTENT.encode('utf-8'))
+    digest.update(b'\0' + (installed_version('grpcio-tools') or 'unknown').encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def restore_cached_protos(key):
+    """Put cached generated files in place; returns False on a cache miss"""
+    cache_dir = os.path.join(PROTO_CACHE_DIR, key)
+    if not all(os.path.exists(os.path.join(cache_dir, file)) for file in GENERATED_FILES):
+        return False
+    for file in GENERATED_FILES:
+        cached_path = os.path.join(cache_dir, file)
+        if os.path.exists(file):
+            with open(file, 'rb') as current, open(cached_path, 'rb') as cached:
+                if current.read() == cached.read():
+                    continue
+        shutil.copyfile(cached_path, file)
+        print(f"Restored {file} from cache")
+    return True
+
+def store_cached_protos(key):
+    """Save the generated files under key for the next run"""
+    cache_dir = os.path.join(PROTO_CACHE_DIR, key)
+    os.makedirs(cache_dir, exist_ok=True)
+    for file in GENERATED_FILES:
+        shutil.copyfile(file, os.path.join(cache_dir, file))
+
+def generate_proto_file():
+    """Generate the proto file"""
     # Create directory structure
     os.makedirs('google/assistant/embedded/v1alpha2', exist_ok=True)
 
     proto_path = 'google/assistant/embedded/v1alpha2/embedded_assistant.proto'
     with open(proto_path, 'w') as f:
-        f.write(proto_content)
+        f.write(PROTO_CONTENT)
 
     return proto_path
 
@@ -172,7 +202,6 @@ def move_generated_files():
             raise Exception("No proto files were generated")
         
         # Clean up temporary directory
-        import shutil
         shutil.rmtree('google')
         
         return True
@@ -191,16 +220,21 @@ def generate_protos():
         if not check_installations():
             return False
 
-        print("\nStep 3: Generating proto file...")
-        proto_path = generate_proto_file()
-
-        print("\nStep 4: Compiling proto files...")
-        if not compile_proto(proto_path):
-            return False
-
-        print("\nStep 5: Moving generated files...")
-        if not move_generated_files():
-            return False
+        key = proto_cache_key()
+        if restore_cached_protos(key):
+            print(f"\nSteps 3-5: Using cached protoc output ({key})")
+        else:
+            print("\nStep 3: Generating proto file...")
+            proto_path = generate_proto_file()
+
+            print("\nStep 4: Compiling proto files...")
+            if not compile_proto(proto_path):
+                return False
+
+            print("\nStep 5: Moving generated files...")
+            if not move_generated_files():
+                return False
+            store_cached_protos(key)
 
         print("\nProto files generated successfully!")
         print("Generated files:")
@@ -0,0 +1,63 @@
+# log_buffer.py
+"""Fixed-capacity log for the GUI
+
+Appending is constant time no matter how long the session runs: entries go
+into a bounded deque and the widget text is rebuilt at most once per frame,
+only when something changed. The full history can also go to a rotating
+file on disk.
+"""
+import collections
+import threading
+import time
+
+class LogBuffer:
+    """Ring buffer of timestamped log lines, newest first when rendered"""
+
+    def __init__(self, capacity=500, path=None, max_bytes=1_000_000, backup_count=3):
+        self.capacity = capacity
+        self._entries = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.dirty = False
+        self.total = 0
+
+        # Optional on-disk copy of every entry, rotated by size
+        self._file_logger = None
+        if path:
+            # logging is only imported when spilling to disk; it is slow to load
+            import logging
+            import logging.handlers
+            handler = logging.handlers.RotatingFileHandler(
+                path,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._file_logger = logging.getLogger(f'{__name__}.{id(self)}')
+            self._file_logger.propagate = False
+            self._file_logger.setLevel(logging.INFO)
+            self._file_logger.addHandler(handler)
+
+    def append(self, message):
+        """Add a line; safe to call from any thread"""
+        entry = f"[{time.strftime('%H:%M:%S')}] {message}"
+        with self._lock:
+            self._entries.append(entry)
+            self.total += 1
+            self.dirty = True
+        if self._file_logger is not None:
+            self._file_logger.info(entry)
+
+    def render(self):
+        """Text for the log widget, and clears the dirty flag"""
+        with self._lock:
+            self.dirty = False
+            entries = list(self._entries)
+        entries.reverse()
+        return '\n'.join(entries)
+
+    def close(self):
+        if self._file_logger is not None:
+            for handler in list(self._file_logger.handlers):
+                handler.close()
+                self._file_logger.removeHandler(handler)
@@ -0,0 +1,180 @@
+# metrics.py
+"""Low-overhead latency histograms and counters for the command path
+
+Observations go into fixed buckets (a bisect and an add under a lock), so
+metrics can stay enabled in production. Export them as a Prometheus text
+file, or register a hook to forward every observation elsewhere.
+"""
+import bisect
+import os
+import threading
+import time
+
+# Bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Phases of one command, in the order they happen
+PHASES = (
+    'credentials',       # credential load/refresh on the command path
+    'channel_acquire',   # getting a stub from the channel pool
+    'channel_connect',   # TCP + TLS + HTTP/2 setup of a new pooled channel
+    'request_send',      # starting the Assist call
+    'first_response',    # request sent -> first AssistResponse with audio or text
+    'last_response',     # request sent -> end of the response stream
+    'playback_start',    # command start -> first audio written to the output
+    'playback_end',      # command start -> playback finished
+    'credential_refresh',  # background token refresh
+    'admission_wait',    # time queued by the client-side rate limiter
+)
+
+class Histogram:
+    """Fixed-bucket histogram"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if value is None:
+            raise ValueError("Histogram.observe() needs a number, got None")
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts incl. +Inf, sum, count)"""
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = []
+        running = 0
+        for value in counts:
+            running += value
+            cumulative.append(running)
+        return cumulative, total, count
+
+class Metrics:
+    """Phase histograms, counters and gauges shared by a client and its helpers"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='assistant'):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.hooks = []
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._stop = threading.Event()
+
+    def add_hook(self, callback):
+        """Call callback(name, value) for every observation and counter increment"""
+        self.hooks.append(callback)
+
+    def observe(self, phase, seconds):
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(phase, Histogram(self.buckets))
+        histogram.observe(seconds)
+        for hook in self.hooks:
+            hook(phase, seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        for hook in self.hooks:
+            hook(name, value)
+
+    def gauge(self, name, value):
+        """Set a value that can go down as well as up, e.g. a queue depth"""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe_result(self, result):
+        """Record the phases and sizes of one finished AssistResult"""
+        self.count('commands_total')
+        if result.cached:
+            self.count('cache_hits_total')
+            return
+
+        self.observe('credentials', result.authenticated_at - result.started_at)
+        self.observe('channel_acquire', result.stub_ready_at - result.authenticated_at)
+        self.observe('request_send', result.request_sent_at - result.stub_ready_at)
+        if result.first_chunk_at is not None:
+            self.observe('first_response', result.first_chunk_at - result.request_sent_at)
+        self.observe('last_response', result.finished_at - result.request_sent_at)
+        self.count('audio_bytes_total', result.audio_bytes)
+        self.count('audio_chunks_total', result.chunk_count)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        name = f'{self.prefix}_phase_seconds'
+        lines = [
+            f'# HELP {name} Latency of command phases in seconds.',
+            f'# TYPE {name} histogram',
+        ]
+        for phase in sorted(self.histograms):
+            cumulative, total, count = self.histograms[phase].snapshot()
+            for bound, value in zip(self.buckets + (float('inf'),), cumulative):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{phase="{phase}",le="{le}"}} {value}')
+            lines.append(f'{name}_sum{{phase="{phase}"}} {total}')
+            lines.append(f'{name}_count{{phase="{phase}"}} {count}')
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+        for counter, value in counters:
+            lines.append(f'# TYPE {self.prefix}_{counter} counter')
+            lines.append(f'{self.prefix}_{counter} {value}')
+        with self._lock:
+            gauges = sorted(self.gauges.items())
+        for gauge, value in gauges:
+            lines.append(f'# TYPE {self.prefix}_{gauge} gauge')
+            lines.append(f'{self.prefix}_{gauge} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Atomically write render_prometheus() to path (textfile collector style)"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def start_exporter(self, path, interval=15.0):
+        """Rewrite the Prometheus file every interval seconds in the background"""
+        def export_loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.write_prometheus(path)
+                except OSError as e:
+                    print(f"Error writing metrics: {e}")
+
+        self._exporter = threading.Thread(target=export_loop, daemon=True)
+        self._exporter.start()
+
+    def stop_exporter(self):
+        self._stop.set()
+
+class Timer:
+    """Times a block into a Metrics phase; a no-op when metrics is None"""
+
+    __slots__ = ('metrics', 'phase', 'started')
+
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.metrics is not None:
+            self.metrics.observe(self.phase, time.perf_counter() - self.started)
+        return False
@@ -0,0 +1,213 @@
+# mock_server.py
+"""Local stand-in for the Embedded Assistant API
+
+Streams synthetic audio (LINEAR16, MP3 or Opus) with configurable chunking, latency and
+error injection so the client can be load-tested and profiled offline.
+
+    python mock_server.py --port 50051 --chunk-count 40 --chunk-delay 0.02
+    python assistant_client.py --endpoint localhost:50051 --insecure
+"""
+import argparse
+import array
+import concurrent.futures
+import math
+import random
+import subprocess
+import threading
+import time
+
+import grpc
+from assistant_protos import embedded_assistant_pb2
+from audio_decoder import find_ffmpeg
+# Local generated service module; it resolves messages through assistant_protos' loaded pb2
+import embedded_assistant_pb2_grpc
+
+def synth_tone(seconds, sample_rate=16000, frequency=440.0, amplitude=0.3):
+    """LINEAR16 mono sine tone"""
+    samples = array.array('h', (
+        int(32767 * amplitude * math.sin(2 * math.pi * frequency * n / sample_rate))
+        for n in range(int(seconds * sample_rate))
+    ))
+    return samples.tobytes()
+
+def encode_audio(pcm, encoding, sample_rate=16000, bitrate='32k', ffmpeg=None):
+    """Compress LINEAR16 mono PCM to MP3 (2) or Opus in Ogg (3) with ffmpeg"""
+    codec, container = {2: ('libmp3lame', 'mp3'), 3: ('libopus', 'ogg')}[encoding]
+    ffmpeg = ffmpeg or find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("Compressed mock audio needs ffmpeg; install it or set FFMPEG_BINARY")
+    return subprocess.run(
+        [ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin',
+         '-f', 's16le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0',
+         '-c:a', codec, '-b:a', bitrate, '-f', container, 'pipe:1'],
+        input=pcm, stdout=subprocess.PIPE, check=True
+    ).stdout
+
+class MockAssistantServicer(embedded_assistant_pb2_grpc.EmbeddedAssistantServicer):
+    """Answers every Assist call with a tone, split into chunks on a schedule
+
+    MP3 and Opus requests get the same tone compressed with ffmpeg, split
+    into the same number of chunks.
+    """
+
+    def __init__(self, chunk_size=3200, chunk_count=25, chunk_delay=0.0,
+                 first_byte_delay=0.0, error_rate=0.0, error_code=grpc.StatusCode.UNAVAILABLE,
+                 stall_rate=0.0, stall_delay=5.0, device_qps=None, seed=None):
+        self.chunk_size = chunk_size
+        self.chunk_count = chunk_count
+        self.chunk_delay = chunk_delay
+        self.first_byte_delay = first_byte_delay
+        self.error_rate = error_rate
+        self.error_code = error_code
+        # Fraction of calls that hang for stall_delay before their first response
+        self.stall_rate = stall_rate
+        self.stall_delay = stall_delay
+        # Per-device quota: calls per second over a 1 s window, RESOURCE_EXHAUSTED beyond it
+        self.device_qps = device_qps
+        self._device_calls = {}
+        self._quota_lock = threading.Lock()
+        self._random = random.Random(seed)
+        # One tone long enough for every chunk, sliced per response without copying
+        self._audio = {1: memoryview(synth_tone(chunk_size * chunk_count / 32000))}
+        self._audio_lock = threading.Lock()
+        self.calls = 0
+
+    def audio_for(self, encoding):
+        """The answer audio in the requested encoding, encoded once and reused"""
+        encoding = encoding or 1
+        with self._audio_lock:
+            if encoding not in self._audio:
+                self._audio[encoding] = memoryview(encode_audio(bytes(self._audio[1]), encoding))
+            return self._audio[encoding]
+
+    def _over_quota(self, device_id):
+        """Count a call for device_id; True if it exceeds device_qps in the last second"""
+        now = time.monotonic()
+        with self._quota_lock:
+            calls = [t for t in self._device_calls.get(device_id, []) if now - t < 1.0]
+            over = len(calls) >= self.device_qps
+            if not over:
+                calls.append(now)
+            self._device_calls[device_id] = calls
+        return over
+
+    def Assist(self, request_iterator, context):
+        self.calls += 1
+        config = None
+        audio_in_bytes = 0
+        for request in request_iterator:
+            if request.HasField('config'):
+                config = request.config
+            else:
+                audio_in_bytes += len(request.audio_in)
+
+        if self.device_qps is not None and config is not None:
+            if self._over_quota(config.device_config.device_id):
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, 'Mock per-device quota exceeded')
+        if self._random.random() < self.error_rate:
+            context.abort(self.error_code, 'Injected error from mock server')
+
+        if self.first_byte_delay:
+            time.sleep(self.first_byte_delay)
+        if self.stall_rate and self._random.random() < self.stall_rate:
+            # Sleep in steps so a cancelled (e.g. hedged-away) call frees its worker
+            stall_until = time.monotonic() + self.stall_delay
+            while context.is_active() and time.monotonic() < stall_until:
+                time.sleep(0.01)
+
+        if audio_in_bytes:
+            yield embedded_assistant_pb2.AssistResponse(
+                event_type=embedded_assistant_pb2.AssistResponse.END_OF_UTTERANCE
+            )
+            yield embedded_assistant_pb2.AssistResponse(
+                speech_results=[embedded_assistant_pb2.SpeechRecognitionResult(
+                    transcript=f'<{audio_in_bytes} bytes of speech>', stability=1.0
+                )]
+            )
+
+        query = config.text_query if config is not None else ''
+        audio = self.audio_for(config.audio_out_config.encoding if config is not None else 1)
+        chunk_size = -(-len(audio) // self.chunk_count)
+        for index in range(self.chunk_count):
+            if not context.is_active():
+                return
+            if index and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            response = embedded_assistant_pb2.AssistResponse()
+            response.audio_out.audio_data = bytes(audio[index * chunk_size:(index + 1) * chunk_size])
+            if index == 0:
+                response.dialog_state_out.supplemental_display_text = f'Mock answer to: {query}'
+            yield response
+
+def create_server(servicer, address='127.0.0.1:0', tls_cert=None, tls_key=None, max_workers=64):
+    """Start a gRPC server for servicer; returns (server, bound port)
+
+    Plaintext unless tls_cert/tls_key (PEM bytes) are given. Each in-flight
+    Assist stream holds one of max_workers threads.
+    """
+    server = grpc.server(concurrent.futures.ThreadPoolExecutor(max_workers=max_workers))
+    embedded_assistant_pb2_grpc.add_EmbeddedAssistantServicer_to_server(servicer, server)
+    if tls_cert and tls_key:
+        port = server.add_secure_port(address, grpc.ssl_server_credentials([(tls_key, tls_cert)]))
+    else:
+        port = server.add_insecure_port(address)
+    server.start()
+    return server, port
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Embedded Assistant API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=50051)
+    parser.add_argument('--chunk-size', type=int, default=3200, help="audio bytes per response")
+    parser.add_argument('--chunk-count', type=int, default=25, help="audio responses per call")
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help="seconds between chunks")
+    parser.add_argument('--first-byte-delay', type=float, default=0.0,
+                        help="seconds before the first response")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="fraction of calls aborted with --error-code")
+    parser.add_argument('--error-code', default='UNAVAILABLE',
+                        choices=[code.name for code in grpc.StatusCode if code != grpc.StatusCode.OK])
+    parser.add_argument('--stall-rate', type=float, default=0.0,
+                        help="fraction of calls that stall before the first response")
+    parser.add_argument('--stall-delay', type=float, default=5.0, help="seconds a stalled call hangs")
+    parser.add_argument('--device-qps', type=float,
+                        help="per-device quota in calls per second; beyond it calls fail "
+                             "with RESOURCE_EXHAUSTED")
+    parser.add_argument('--tls-cert', help="PEM certificate; serve TLS instead of plaintext")
+    parser.add_argument('--tls-key', help="PEM private key for --tls-cert")
+    parser.add_argument('--max-workers', type=int, default=64)
+    args = parser.parse_args()
+
+    tls_cert = tls_key = None
+    if args.tls_cert:
+        with open(args.tls_cert, 'rb') as f:
+            tls_cert = f.read()
+        with open(args.tls_key, 'rb') as f:
+            tls_key = f.read()
+
+    servicer = MockAssistantServicer(
+        chunk_size=args.chunk_size,
+        chunk_count=args.chunk_count,
+        chunk_delay=args.chunk_delay,
+        first_byte_delay=args.first_byte_delay,
+        error_rate=args.error_rate,
+        error_code=grpc.StatusCode[args.error_code],
+        stall_rate=args.stall_rate,
+        stall_delay=args.stall_delay,
+        device_qps=args.device_qps
+    )
+    server, port = create_server(
+        servicer,
+        f'{args.host}:{args.port}',
+        tls_cert=tls_cert,
+        tls_key=tls_key,
+        max_workers=args.max_workers
+    )
+    print(f"Mock Assistant listening on {args.host}:{port} ({'TLS' if tls_cert else 'plaintext'})")
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(grace=1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# rate_limiter.py
+"""Client-side admission control for Assist calls
+
+A token bucket (rate per second, up to `burst` at once) decides when each
+command may go out, so bursts are smoothed locally instead of being
+rejected by the API after a wasted round trip. Callers that have to wait
+queue in arrival order. The queue is bounded, and a caller that would wait
+longer than max_wait is refused immediately with RateLimited.
+
+The bucket is kept as a "theoretical arrival time" (the GCRA form of a
+token bucket), so each caller knows its slot on arrival and sleeps
+without holding the lock. A RESOURCE_EXHAUSTED answer halves the rate
+(down to min_rate) and empties the bucket, whose size shrinks with the
+rate. Each success then raises the
+rate back towards its configured value in small steps.
+"""
+import threading
+import time
+
+# Quota errors closer together than this count as one burst and slow down once
+DECREASE_INTERVAL = 1.0
+
+class RateLimited(Exception):
+    """Command refused locally; retry_after is the suggested wait in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Rate limited ({reason}); retry in {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class RateLimiter:
+    """Token bucket with a bounded FIFO admission queue that adapts to quota errors"""
+
+    def __init__(self, rate=5.0, burst=10, max_queue=32, max_wait=5.0, min_rate=0.2,
+                 decrease=0.5, recovery_steps=100, metrics=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.min_rate = min(min_rate, self.max_rate)
+        self.decrease = decrease
+        # Successes needed to climb from min_rate back to the configured rate
+        self.recovery_steps = recovery_steps
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        # When the bucket would next be full again, in time.monotonic() seconds
+        self._tat = 0.0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.quota_errors = 0
+        self._last_decrease = None
+
+    def acquire(self, timeout=None, control=None):
+        """Wait for this command's slot; returns the seconds waited
+
+        Raises RateLimited when the queue is full or the slot is further away
+        than max_wait (or `timeout`, if shorter). A CallControl cancel while
+        waiting raises RateLimited('cancelled') as well.
+        """
+        max_wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+        with self._lock:
+            now = time.monotonic()
+            interval = 1.0 / self.rate
+            tat = max(self._tat, now)
+            wait = max(0.0, tat - (self._current_burst() - 1) * interval - now)
+            if wait > max_wait:
+                reason = 'over rate'
+            elif wait > 0 and self.waiting >= self.max_queue:
+                reason = 'queue full'
+            else:
+                reason = None
+                self._tat = tat + interval
+                if wait > 0:
+                    self.waiting += 1
+                depth = self.waiting
+            if reason is not None:
+                self.rejected += 1
+        if reason is not None:
+            self._count('rate_limit_rejected_total')
+            raise RateLimited(reason, wait)
+
+        if wait > 0:
+            self._gauge('rate_limit_queue_depth', depth)
+            try:
+                if self._sleep(wait, control):
+                    # Hand the reserved slot back, or everyone queued behind inherits its wait
+                    with self._lock:
+                        self._tat -= interval
+                    raise RateLimited('cancelled', 0.0)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+                    depth = self.waiting
+                self._gauge('rate_limit_queue_depth', depth)
+
+        with self._lock:
+            self.admitted += 1
+            self.wait_seconds += wait
+        if self.metrics is not None:
+            self.metrics.count('rate_limit_admitted_total')
+            self.metrics.observe('admission_wait', wait)
+        return wait
+
+    def _sleep(self, seconds, control):
+        """Sleep, waking early on cancel; True if cancelled"""
+        if control is None:
+            time.sleep(seconds)
+            return False
+        wake = threading.Event()
+        control.on_cancel(wake.set)
+        return wake.wait(seconds)
+
+    def on_quota_error(self):
+        """The API said RESOURCE_EXHAUSTED: slow down and drop any saved-up burst"""
+        with self._lock:
+            self.quota_errors += 1
+            now = time.monotonic()
+            # Concurrent calls rejected by the same burst slow down once, not once each
+            if self._last_decrease is not None and now - self._last_decrease < DECREASE_INTERVAL:
+                return
+            self._last_decrease = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            # An empty bucket: the next slot is one (new) interval away
+            self._tat = max(self._tat, now + self._current_burst() / self.rate)
+            rate = self.rate
+        print(f"Quota exceeded, limiting to {rate:.2f} commands/s")
+        self._count('rate_limit_decreases_total')
+        self._gauge('rate_limit_rate', rate)
+
+    def _current_burst(self):
+        """Burst scaled down with the rate, so a slowed-down bucket can't refill to full size"""
+        return max(1, round(self.burst * self.rate / self.max_rate))
+
+    def on_success(self):
+        """A call went through: creep back towards the configured rate"""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            step = (self.max_rate - self.min_rate) / self.recovery_steps
+            self.rate = min(self.max_rate, self.rate + step)
+            rate = self.rate
+        self._gauge('rate_limit_rate', rate)
+
+    def stats(self):
+        """Current rate, queue depth and admission counters"""
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'burst': self.burst,
+                'queue_depth': self.waiting,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'quota_errors': self.quota_errors,
+                'avg_wait_ms': round(self.wait_seconds / self.admitted * 1000, 1) if self.admitted else 0.0,
+            }
+
+    def _count(self, name):
+        if self.metrics is not None:
+            self.metrics.count(name)
+
+    def _gauge(self, name, value):
+        if self.metrics is not None:
+            self.metrics.gauge(name, value)
@@ -4,11 +4,10 @@ from pathlib import Path
 import google.auth.transport.requests
 import google.oauth2.credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-import subprocess
-import sys
+from requirements_check import ensure_requirements
 
-def install_requirements():
-    """Install required packages"""
+def install_requirements(upgrade=None):
+    """Install required packages that are missing (all of them with upgrade)"""
     packages = [
         'google-assistant-sdk[samples]',
         'google-auth-oauthlib',
@@ -16,11 +15,9 @@ def install_requirements():
         'google-assistant-grpc',
         'grpcio'
     ]
-    for package in packages:
-        try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", package])
-        except subprocess.CalledProcessError as e:
-            print(f"Warning: Failed to install {package}: {e}")
+    if upgrade is None:
+        upgrade = bool(os.environ.get('ASSISTANT_SETUP_UPGRADE'))
+    ensure_requirements(packages, upgrade=upgrade)
 
 def get_project_id():
     """Get project ID from credentials file"""
@@ -0,0 +1,67 @@
+# requirements_check.py
+"""Install only the setup requirements that are actually missing
+
+Installed distributions are looked up through importlib.metadata, which
+takes milliseconds, so a warm machine skips pip entirely. Everything that
+is missing goes to a single pip call.
+"""
+import subprocess
+import sys
+from importlib import metadata
+
+try:
+    from packaging.requirements import Requirement
+except ImportError:
+    Requirement = None
+
+def _parse(requirement):
+    """(distribution name, specifier or None) for a requirement string"""
+    if Requirement is not None:
+        parsed = Requirement(requirement)
+        return parsed.name, parsed.specifier or None
+    # Without packaging only the name is checked
+    name = requirement.split('[')[0]
+    for operator in ('==', '>=', '<=', '~=', '!=', '>', '<'):
+        name = name.split(operator)[0]
+    return name.strip(), None
+
+def installed_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+def missing_requirements(requirements):
+    """Requirements that are not installed or whose installed version doesn't match
+
+    Extras such as 'pkg[samples]' are satisfied by the base distribution.
+    """
+    missing = []
+    for requirement in requirements:
+        name, specifier = _parse(requirement)
+        version = installed_version(name)
+        if version is None or (specifier is not None and not specifier.contains(version, prereleases=True)):
+            missing.append(requirement)
+    return missing
+
+def ensure_requirements(requirements, upgrade=False):
+    """pip install whatever is missing; returns True when nothing is left to do
+
+    With upgrade=True every requirement is passed to pip install --upgrade,
+    as the setup scripts used to do on every run.
+    """
+    to_install = list(requirements) if upgrade else missing_requirements(requirements)
+    if not to_install:
+        print("All required packages are already installed")
+        return True
+
+    print(f"Installing {', '.join(to_install)}...")
+    command = [sys.executable, "-m", "pip", "install"]
+    if upgrade:
+        command.append("--upgrade")
+    try:
+        subprocess.check_call(command + to_install)
+    except subprocess.CalledProcessError as e:
+        print(f"Warning: Failed to install {', '.join(to_install)}: {e}")
+        return False
+    return True
@@ -0,0 +1,201 @@
+# response_cache.py
+"""Local cache of Assistant answers to repeated text queries
+
+Asking the same thing twice ("what's the capital of France") costs a full
+round trip and a slice of quota for an answer that has not changed. Answers
+are kept in memory, and optionally in a directory so they survive a
+restart. Queries that look time-sensitive are never cached. The directory is
+bounded as well: expired answers are deleted as new ones are written, and
+past max_disk_entries the oldest answers go first.
+"""
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# Queries whose answer depends on when (or where) they are asked
+DEFAULT_DENYLIST = [
+    r'\b(time|date|day|today|tonight|tomorrow|yesterday|now|current|latest)\b',
+    r'\b(weather|forecast|temperature|news|headlines|traffic|score|stock)\b',
+    r'\b(timer|alarm|remind|reminder|calendar|schedule)\b',
+]
+
+CachedResponse = collections.namedtuple('CachedResponse', ['audio', 'text', 'expires_at'])
+
+class ResponseCache:
+    """LRU + TTL cache of Assistant answers to repeated text queries
+
+    Entries are keyed by the normalized query, language and audio output
+    settings. Memory holds at most `max_entries` answers; with `path` set every
+    answer is also written there and read back after a restart until its TTL
+    runs out. The directory keeps at most `max_disk_entries` answers.
+    """
+
+    def __init__(self, max_entries=256, ttl=24 * 3600, denylist=None, path=None, max_disk_entries=1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        patterns = DEFAULT_DENYLIST if denylist is None else denylist
+        self.denylist = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._prune_disk(orphans=True)
+
+    @staticmethod
+    def normalize(text):
+        """Lower-case, collapse whitespace and drop trailing punctuation"""
+        return ' '.join(text.lower().split()).rstrip('?!. ')
+
+    def cacheable(self, text):
+        """False for time-sensitive queries that must always go to the server"""
+        normalized = self.normalize(text)
+        if not normalized or any(pattern.search(normalized) for pattern in self.denylist):
+            with self._lock:
+                self.bypassed += 1
+            return False
+        return True
+
+    def make_key(self, text, language_code, encoding, sample_rate_hertz, volume_percentage):
+        raw = json.dumps([
+            self.normalize(text),
+            language_code,
+            encoding,
+            sample_rate_hertz,
+            volume_percentage,
+        ])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached answer for key, or None (counted as a miss)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None and self.path:
+                entry = self._load(key, now)
+                if entry is not None:
+                    self._insert(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, audio, text=''):
+        entry = CachedResponse(bytes(audio), text, time.time() + self.ttl)
+        with self._lock:
+            self._insert(key, entry)
+        if self.path:
+            self._store(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            for name in os.listdir(self.path):
+                if name.endswith('.pcm') or name.endswith('.json'):
+                    os.remove(os.path.join(self.path, name))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _files(self, key):
+        base = os.path.join(self.path, key)
+        return f'{base}.pcm', f'{base}.json'
+
+    def _load(self, key, now):
+        audio_path, meta_path = self._files(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['expires_at'] <= now:
+                os.remove(meta_path)
+                os.remove(audio_path)
+                return None
+            with open(audio_path, 'rb') as f:
+                return CachedResponse(f.read(), meta.get('text', ''), meta['expires_at'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store(self, key, entry):
+        audio_path, meta_path = self._files(key)
+        try:
+            with open(audio_path, 'wb') as f:
+                f.write(entry.audio)
+            # Metadata last: an entry only counts once both files are complete
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'text': entry.text, 'expires_at': entry.expires_at}, f)
+        except OSError as e:
+            print(f"Error writing response cache entry: {e}")
+            return
+        self._prune_disk()
+
+    def _prune_disk(self, orphans=False):
+        """Delete expired answers, then the least recently written past max_disk_entries
+
+        An entry was written ttl seconds before it expires, so its metadata
+        file's mtime tells both apart without reading it. With orphans=True,
+        audio left without metadata by an interrupted write goes too; that is
+        only safe before this cache starts writing.
+        """
+        with self._disk_lock:
+            try:
+                written = {}
+                audio = set()
+                with os.scandir(self.path) as entries:
+                    for item in entries:
+                        key, ext = os.path.splitext(item.name)
+                        if ext == '.json':
+                            written[key] = item.stat().st_mtime
+                        elif ext == '.pcm':
+                            audio.add(key)
+            except OSError as e:
+                print(f"Error scanning response cache directory: {e}")
+                return
+
+            expired_before = time.time() - self.ttl
+            by_age = sorted(written, key=written.get)
+            excess = max(0, len(by_age) - self.max_disk_entries)
+            stale = [key for key in by_age[excess:] if written[key] <= expired_before]
+            remove = by_age[:excess] + stale
+            if orphans:
+                remove += [key for key in audio if key not in written]
+            for key in remove:
+                for file_path in reversed(self._files(key)):
+                    try:
+                        os.remove(file_path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        print(f"Error removing response cache entry: {e}")
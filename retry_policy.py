@@ -0,0 +1,63 @@
+# retry_policy.py
+"""When and how often to retry a failed Assist call
+
+Only failures that happened before any answer arrived are retried: once
+audio has been played, a retry would repeat it. Each attempt has its own
+gRPC deadline. It covers the whole streamed answer, not just the wait for
+the first response, so it has to be long enough for the longest readout.
+Waits between them grow exponentially with full jitter so
+many clients don't retry in lockstep after an outage.
+"""
+import random
+
+import grpc
+
+# Deadline for one whole Assist stream; the SDK's text sample uses the same.
+# Long answers (news readouts) stream for minutes.
+STREAM_TIMEOUT = 185.0
+
+# Transient failures worth another attempt
+RETRYABLE_CODES = frozenset([
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.ABORTED,
+])
+
+class RetryPolicy:
+    """Attempts, per-attempt deadline, backoff and optional hedging for text queries
+
+    `hedge_after` (seconds) fires a second, parallel attempt when the first
+    has not produced any response by then; whichever answers first wins and
+    the other is cancelled. None disables hedging.
+    """
+
+    def __init__(self, max_attempts=3, attempt_timeout=STREAM_TIMEOUT, initial_backoff=0.2,
+                 max_backoff=5.0, multiplier=2.0, retryable_codes=RETRYABLE_CODES,
+                 hedge_after=None, seed=None):
+        self.max_attempts = max(1, max_attempts)
+        self.attempt_timeout = attempt_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.retryable_codes = frozenset(retryable_codes)
+        self.hedge_after = hedge_after
+        self._random = random.Random(seed)
+
+    def is_retryable(self, error):
+        return isinstance(error, grpc.RpcError) and error.code() in self.retryable_codes
+
+    def backoff(self, attempt):
+        """Seconds to wait after failed attempt number `attempt` (1-based)"""
+        ceiling = min(self.max_backoff, self.initial_backoff * self.multiplier ** (attempt - 1))
+        return self._random.uniform(0, ceiling)
+
+    def attempt_deadline(self, remaining):
+        """Deadline for the next attempt given the time left overall (None = unlimited)"""
+        if remaining is None:
+            return self.attempt_timeout
+        if self.attempt_timeout is None:
+            return remaining
+        return min(self.attempt_timeout, remaining)
+
+# Single attempt, no deadline: the behaviour before policies existed
+NO_RETRY = RetryPolicy(max_attempts=1, attempt_timeout=None)
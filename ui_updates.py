@@ -0,0 +1,49 @@
+# ui_updates.py
+"""Widget updates posted from worker threads, applied by the render loop
+
+Workers never touch the GUI library themselves. They append to a deque
+(atomic in CPython, so no lock is held against the renderer) and the render
+loop drains it once per frame, keeping only the last value per widget so a
+burst of progress updates costs one widget write.
+"""
+import collections
+
+class UIUpdateQueue:
+    """Coalescing queue of set_value / configure_item calls"""
+
+    def __init__(self):
+        self._pending = collections.deque()
+        # Widget writes made by drain(); only touched on the render thread
+        self.applied = 0
+
+    def set_value(self, tag, value):
+        self._pending.append(('value', tag, value))
+
+    def configure_item(self, tag, **options):
+        self._pending.append(('config', tag, options))
+
+    def drain(self, set_value, configure_item):
+        """Apply everything posted so far, last write per widget wins
+
+        Call from the render thread before each frame with the GUI library's
+        set_value and configure_item. Returns the number of widget writes made.
+        """
+        latest = {}
+        while True:
+            try:
+                kind, tag, payload = self._pending.popleft()
+            except IndexError:
+                break
+            if kind == 'value':
+                latest[kind, tag] = payload
+            else:
+                # Options are merged so configuring different keys of one item keeps both
+                latest.setdefault((kind, tag), {}).update(payload)
+
+        for (kind, tag), payload in latest.items():
+            if kind == 'value':
+                set_value(tag, payload)
+            else:
+                configure_item(tag, **payload)
+        self.applied += len(latest)
+        return len(latest)